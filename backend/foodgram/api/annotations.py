@@ -0,0 +1,14 @@
+"""Аннотации запросов отметками текущего пользователя."""
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from recipes.models import Subscribe
+
+
+def is_subscribed(user, author='pk'):
+    """
+    Подписан ли пользователь на автора, которого во внешнем
+    запросе задаёт поле author.
+    """
+    if not user.is_authenticated:
+        return Value(False, output_field=BooleanField())
+    return Exists(Subscribe.objects.filter(
+        user=user, author=OuterRef(author)))
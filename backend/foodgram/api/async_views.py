@@ -0,0 +1,137 @@
+"""
+Асинхронные представления для самых нагруженных эндпоинтов чтения.
+
+Подключаются настройкой ASYNC_READ_PATH (по умолчанию выключены)
+при работе под ASGI-сервером. Запрос проходит через экземпляр
+синхронного вьюсета: аутентификация, права, лимиты, фильтры,
+пагинация и обработка ошибок — те же классы DRF, что и в синхронных
+представлениях. Проверки initial() и разбор фильтров (они читают
+кэш и БД синхронно) выполняются одним переходом в поток синхронного
+кода; COUNT, страница и строки ответа читаются асинхронным ORM.
+Сборка недостающих документов и загрузка отношений пользователя
+из БД при промахе кэша тоже выполняются в потоке. Изменяющие
+запросы передаются синхронным представлениям целиком.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import redirect
+from recipes.models import Ingredient, Recipe, RecipeShortLink, Tag
+from rest_framework.response import Response
+
+from .fieldsets import Fieldset
+from .representations import (afill_documents, aget_relations, build_recipes,
+                              get_recipe_values)
+from .views import object_not_found
+from core.filtres import RecipeFilter
+from core.pagination import PopularityPagination
+
+
+def _get_view(sync_view, request, args, kwargs):
+    """Экземпляр вьюсета и запрос DRF, как в ViewSetMixin.as_view()."""
+    view = sync_view.cls(**sync_view.initkwargs)
+    view.action_map = {'head': sync_view.actions['get'],
+                       **sync_view.actions}
+    view.args, view.kwargs = args, kwargs
+    view.request = view.initialize_request(request, *args, **kwargs)
+    view.headers = view.default_response_headers
+    return view
+
+
+def _finalize(view, response):
+    """
+    Ответ как у APIView.dispatch(). JSON рендерится сразу, остальные
+    форматы (Browsable API) — Django в синхронном потоке.
+    """
+    response = view.finalize_response(
+        view.request, response, *view.args, **view.kwargs)
+    if response.accepted_renderer.format == 'json':
+        response.render()
+    return response
+
+
+def async_read_view(async_get, sync_view):
+    """
+    Представление, обслуживающее GET асинхронно,
+    а остальные методы — синхронным представлением DRF.
+    """
+    sync_dispatch = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_dispatch(request, *args, **kwargs)
+        viewset = _get_view(sync_view, request, args, kwargs)
+
+        def prepare():
+            viewset.initial(viewset.request, *args, **kwargs)
+            return viewset.filter_queryset(viewset.get_queryset())
+
+        try:
+            queryset = await sync_to_async(prepare)()
+            response = await async_get(
+                viewset.request, viewset, queryset, **kwargs)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        return _finalize(viewset, response)
+
+    view.csrf_exempt = True
+    return view
+
+
+async def tag_list(request, view, tags):
+    tags = tags.values('id', 'name', 'slug')
+    return Response([tag async for tag in tags])
+
+
+async def tag_detail(request, view, tags, pk):
+    tag = await tags.filter(pk=pk).values('id', 'name', 'slug').afirst()
+    if tag is None:
+        raise object_not_found(Tag)
+    return Response(tag)
+
+
+async def ingredient_list(request, view, ingredients):
+    ingredients = ingredients.values('id', 'name', 'measurement_unit')
+    return Response([ingredient async for ingredient in ingredients])
+
+
+async def ingredient_detail(request, view, ingredients, pk):
+    ingredient = await ingredients.filter(pk=pk).values(
+        'id', 'name', 'measurement_unit').afirst()
+    if ingredient is None:
+        raise object_not_found(Ingredient)
+    return Response(ingredient)
+
+
+async def _build_recipes(request, rows):
+    fieldset = Fieldset.from_request(request)
+    return build_recipes(
+        request, rows, await aget_relations(request.user, fieldset), fieldset)
+
+
+async def recipe_list(request, view, recipes):
+    """Страница пагинатора вьюсета, документы и отношения."""
+    if RecipeFilter.is_popular(request):
+        view.pagination_class = PopularityPagination
+    page = await view.paginator.apaginate_queryset(
+        recipes.values(*get_recipe_values(Fieldset.from_request(request))),
+        request, view=view)
+    rows = await afill_documents(page)
+    return view.get_paginated_response(await _build_recipes(request, rows))
+
+
+async def recipe_detail(request, view, recipes, pk):
+    row = await recipes.filter(pk=pk).values(
+        *get_recipe_values(Fieldset.from_request(request))).afirst()
+    if row is None:
+        raise object_not_found(Recipe)
+    await afill_documents([row])
+    return Response((await _build_recipes(request, [row]))[0])
+
+
+async def redirect_short_link(request, short_hash):
+    recipe_id = await RecipeShortLink.objects.filter(
+        short_link=short_hash).values_list('recipe_id', flat=True).afirst()
+    if recipe_id is None:
+        raise Http404
+    return redirect(f"{settings.BASE_URL}/recipes/{recipe_id}/")
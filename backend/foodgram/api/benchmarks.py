@@ -0,0 +1,208 @@
+"""Сценарии микробенчмарков сериализаторов, фильтров и запросов API."""
+import statistics
+import time
+import tracemalloc
+
+from django.db.models import Sum
+from recipes.models import Recipe, RecipeIngredients, RecipeShortLink
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import UserRateThrottle
+
+from .representations import RECIPE_VALUES, represent_recipes
+from .serializers import RecipeSerializer, SubscriptionsSerialiazer
+from core.db.instrumentation import QueryRecorder
+from core.filtres import RecipeFilter
+from core.models import CustomUser as User
+from core.renderers import ORJSONRenderer
+from core.throttling import UserSlidingWindowThrottle
+
+BENCHMARKS = {}
+THROTTLE_CHECKS = 200
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def make_request(user, path='/api/recipes/', params=None):
+    request = Request(APIRequestFactory().get(path, params or {}))
+    request.user = user
+    return request
+
+
+def measure(func, repeat=5):
+    """
+    Медиана и минимум времени выполнения, число запросов к БД
+    и пиковая память (отдельным прогоном под tracemalloc).
+    """
+    timings = []
+    for _ in range(repeat):
+        with QueryRecorder().record() as recorder:
+            started = time.perf_counter()
+            items = func()
+            timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = statistics.median(timings)
+    return {
+        'median_ms': round(median * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'items': items,
+        'items_per_second': round(items / median, 1) if items else None,
+        'queries': recorder.count,
+        'db_ms': round(recorder.duration * 1000, 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+@benchmark('recipe_serializer')
+def recipe_serializer(context):
+    recipes = Recipe.objects.all()[:context['page_size']]
+    request = make_request(context['viewer'])
+
+    def run():
+        return len(RecipeSerializer(
+            recipes.all(), many=True, context={'request': request}).data)
+    return run
+
+
+@benchmark('recipe_rows')
+def recipe_rows(context):
+    rows = Recipe.objects.values(*RECIPE_VALUES)[:context['page_size']]
+    request = make_request(context['viewer'])
+
+    def run():
+        return len(represent_recipes(request, rows.all()))
+    return run
+
+
+def render_benchmark(renderer_class):
+    def factory(context):
+        request = make_request(context['viewer'])
+        data = represent_recipes(request, Recipe.objects.values(
+            *RECIPE_VALUES)[:context['page_size']])
+        renderer = renderer_class()
+
+        def run():
+            renderer.render(data)
+            return len(data)
+        return run
+    return factory
+
+
+benchmark('render_json')(render_benchmark(JSONRenderer))
+benchmark('render_orjson')(render_benchmark(ORJSONRenderer))
+
+
+@benchmark('subscriptions_serializer')
+def subscriptions_serializer(context):
+    authors = User.objects.filter(
+        subscriptions__user=context['viewer'])[:context['page_size']]
+    request = make_request(context['viewer'], '/api/users/subscriptions/',
+                           {'recipes_limit': 3})
+
+    def run():
+        return len(SubscriptionsSerialiazer(
+            authors.all(), many=True, context={'request': request}).data)
+    return run
+
+
+def filter_benchmark(params):
+    def factory(context):
+        request = make_request(context['viewer'], params=params(context))
+
+        def run():
+            filterset = RecipeFilter(
+                request.query_params, queryset=Recipe.objects.all(),
+                request=request)
+            queryset = filterset.qs
+            queryset.count()
+            return len(queryset[:context['page_size']])
+        return run
+    return factory
+
+
+benchmark('filter_tags')(filter_benchmark(
+    lambda context: {'tags': context['tags'][:2]}))
+benchmark('filter_author')(filter_benchmark(
+    lambda context: {'author': context['author'].id}))
+benchmark('filter_is_favorited')(filter_benchmark(
+    lambda context: {'is_favorited': 1}))
+benchmark('filter_is_in_shopping_cart')(filter_benchmark(
+    lambda context: {'is_in_shopping_cart': 1}))
+benchmark('filter_combined')(filter_benchmark(
+    lambda context: {'tags': context['tags'][:1], 'is_favorited': 1}))
+
+
+@benchmark('shopping_list')
+def shopping_list(context):
+    def run():
+        return len(list(
+            RecipeIngredients.objects.filter(
+                recipe__shopping_cart__user=context['viewer'].id)
+            .values('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(amount=Sum('amount'))
+        ))
+    return run
+
+
+@benchmark('short_link')
+def short_link(context):
+    links = context['short_links']
+
+    def run():
+        for link in links:
+            RecipeShortLink.objects.select_related('recipe').get(
+                short_link=link)
+        return len(links)
+    return run
+
+
+def throttle_benchmark(throttle_class, history):
+    """
+    Проверки лимита клиентом, который уже сделал history запросов
+    в текущем интервале.
+    """
+    class Throttle(throttle_class):
+        scope = 'benchmark'
+        rate = '1000000000/hour'
+
+    def factory(context):
+        request = make_request(context['viewer'])
+        throttle = Throttle()
+        key = throttle.get_cache_key(request, None)
+        if issubclass(throttle_class, UserSlidingWindowThrottle):
+            window = int(throttle.timer() // throttle.duration)
+            throttle.cache.set(f'{key}:{window}', history, throttle.duration)
+        else:
+            throttle.cache.set(key, [throttle.timer()] * history,
+                               throttle.duration)
+
+        def run():
+            for _ in range(THROTTLE_CHECKS):
+                throttle.allow_request(request, None)
+            return THROTTLE_CHECKS
+        return run
+    return factory
+
+
+for history in (1_000, 10_000):
+    benchmark(f'throttle_drf_{history}')(
+        throttle_benchmark(UserRateThrottle, history))
+    benchmark(f'throttle_sliding_{history}')(
+        throttle_benchmark(UserSlidingWindowThrottle, history))
+
+
+def run_benchmarks(context, names=None, repeat=5):
+    return {
+        name: measure(factory(context), repeat)
+        for name, factory in BENCHMARKS.items()
+        if not names or name in names
+    }
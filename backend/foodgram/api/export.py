@@ -0,0 +1,137 @@
+"""
+Выгрузка каталога рецептов в NDJSON: одна строка — один рецепт
+с тегами и ингредиентами.
+
+Рецепты читаются серверным курсором (iterator(chunk_size)) в одной
+транзакции: выгрузка видит согласованный снимок, а память процесса
+не зависит от размера каталога. Теги, ингредиенты и автор берутся
+из документов рецептов; устаревшие документы собираются пачкой
+на каждый chunk. С since выгружаются рецепты, изменённые начиная
+с этого момента, в порядке (updated, id), а за ними — отметки
+удалённых с этого момента рецептов ({"id": ..., "deleted": ...}).
+
+updated ставится при сохранении, а не при фиксации транзакции: рецепт
+из транзакции, начатой до прошлой выгрузки и зафиксированной после,
+получил бы updated раньше её since. Поэтому since сдвигается назад
+на SINCE_OVERLAP; повторы в соседних выгрузках безопасны.
+"""
+from datetime import timedelta
+from itertools import islice
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from recipes.models import DeletedRecipe, Recipe
+
+from .representations import fill_documents, media_url
+from core.constants import ExportLimits
+
+EXPORT_VALUES = ('id', 'document', 'pub_date', 'updated')
+
+
+def parse_since(value):
+    """Момент since из ISO 8601; наивное время — в часовом поясе проекта."""
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(f'Неверная дата: {value}.')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def get_export_queryset(since=None):
+    """
+    Рецепты для выгрузки. База выбирается сразу: строки читаются
+    уже после выхода из представления.
+    """
+    queryset = Recipe.objects.order_by('updated', 'id').values(
+        *EXPORT_VALUES)
+    if since is not None:
+        queryset = queryset.filter(updated__gte=get_overlapped(since))
+    return queryset.using(queryset.db)
+
+
+def get_deleted_queryset(since):
+    """Отметки рецептов, удалённых начиная с since (с запасом)."""
+    queryset = DeletedRecipe.objects.filter(
+        deleted__gte=get_overlapped(since)).values('id', 'deleted')
+    return queryset.using(queryset.db)
+
+
+def get_overlapped(since):
+    return since - timedelta(seconds=ExportLimits.SINCE_OVERLAP)
+
+
+def export_recipe(request, row):
+    document = row['document']
+    author_id, first_name, last_name, username, _, _ = document['author']
+    return {
+        'id': row['id'],
+        'name': document['name'],
+        'text': document['text'],
+        'cooking_time': document['cooking_time'],
+        'image': media_url(request, document['image']),
+        'author': {
+            'id': author_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+        },
+        'tags': [{'id': tag_id, 'name': name, 'slug': slug}
+                 for tag_id, name, slug in document['tags']],
+        'ingredients': [
+            {'id': ingredient_id, 'name': name, 'amount': amount,
+             'measurement_unit': unit}
+            for ingredient_id, name, amount, unit in document['ingredients']
+        ],
+        'pub_date': row['pub_date'],
+        'updated': row['updated'],
+    }
+
+
+def iter_export(queryset, request=None,
+                chunk_size=ExportLimits.CHUNK_SIZE, deleted=None):
+    """
+    Строки NDJSON, по одному блоку байт на chunk рецептов,
+    затем блоки отметок удаления из deleted.
+    """
+    with transaction.atomic(using=queryset.db):
+        rows = queryset.iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            yield b''.join(
+                orjson.dumps(export_recipe(request, row)) + b'\n'
+                for row in fill_documents(chunk))
+        if deleted is None:
+            return
+        rows = deleted.iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            yield b''.join(orjson.dumps(row) + b'\n' for row in chunk)
+
+
+async def aiter_export(iterator):
+    """
+    Синхронная выгрузка для ASGI: блоки читаются в потоке
+    синхронного кода, иначе Django собрал бы ответ целиком в памяти.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(iterator, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(iterator.close)()
+
+
+def export_response(request, queryset, deleted=None):
+    iterator = iter_export(queryset, request, deleted=deleted)
+    response = StreamingHttpResponse(
+        aiter_export(iterator) if isinstance(request, ASGIRequest)
+        else iterator,
+        content_type='application/x-ndjson',
+    )
+    response['Content-Disposition'] = 'attachment; filename=recipes.ndjson'
+    response['X-Accel-Buffering'] = 'no'
+    return response
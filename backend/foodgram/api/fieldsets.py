@@ -0,0 +1,117 @@
+"""
+Частичный вывод полей ответа: параметры fields= и omit=.
+
+fields=id,name,author.username оставляет только перечисленные поля
+(вложенные — через точку), omit=ingredients,author.email убирает поля.
+По набору полей представления решают, что читать из БД: отброшенные
+поля не стоят ни запросов, ни аннотаций.
+"""
+from functools import cached_property
+
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class Fieldset:
+    """Набор выводимых полей; вложенные поля — через точку."""
+
+    def __init__(self, fields=None, omit=()):
+        self.fields = None if fields is None else frozenset(fields)
+        self.omit = frozenset(omit)
+        self._nested = {}
+
+    @classmethod
+    def from_request(cls, request):
+        """Набор полей запроса, один раз на запрос."""
+        fieldset = getattr(request, '_fieldset', None)
+        if fieldset is None:
+            fields = _split(request.GET.get(FIELDS_PARAM, ''))
+            fieldset = cls(fields or None,
+                           _split(request.GET.get(OMIT_PARAM, '')))
+            request._fieldset = fieldset
+        return fieldset
+
+    @property
+    def is_full(self):
+        return self.fields is None and not self.omit
+
+    def __contains__(self, name):
+        if name in self.omit:
+            return False
+        return self.fields is None or name in self.fields or any(
+            field.startswith(name + '.') for field in self.fields)
+
+    def includes(self, path):
+        """Входит ли в набор поле по пути через точку."""
+        name, _, rest = path.partition('.')
+        return name in self and (not rest or self.nested(name).includes(rest))
+
+    def nested(self, name):
+        """Набор полей вложенного объекта name."""
+        if name not in self._nested:
+            prefix = name + '.'
+            fields = None
+            if self.fields is not None and name not in self.fields:
+                fields = [field[len(prefix):] for field in self.fields
+                          if field.startswith(prefix)]
+            self._nested[name] = Fieldset(
+                fields, [field[len(prefix):] for field in self.omit
+                         if field.startswith(prefix)])
+        return self._nested[name]
+
+    def prune(self, item):
+        """Словарь item без отброшенных полей, включая вложенные."""
+        if self.is_full:
+            return item
+        pruned = {}
+        for name, value in item.items():
+            if name not in self:
+                continue
+            nested = self.nested(name)
+            if nested.is_full:
+                pass
+            elif isinstance(value, dict):
+                value = nested.prune(value)
+            elif isinstance(value, list):
+                value = [nested.prune(element) for element in value]
+            pruned[name] = value
+        return pruned
+
+
+ALL_FIELDS = Fieldset()
+
+
+class FieldsetSerializerMixin:
+    """
+    Вывод только полей из набора. Набор корневого сериализатора
+    берётся из context['fieldset'] или из запроса, вложенного —
+    из набора родителя по имени поля.
+    """
+
+    @cached_property
+    def fieldset(self):
+        holder, parent = self, self.parent
+        if isinstance(parent, ListSerializer):
+            holder, parent = parent, parent.parent
+        if parent is None:
+            if 'fieldset' in self.context:
+                return self.context['fieldset']
+            request = self.context.get('request')
+            if request is None:
+                return ALL_FIELDS
+            return Fieldset.from_request(request)
+        return getattr(parent, 'fieldset', ALL_FIELDS).nested(
+            holder.field_name)
+
+    @property
+    def _readable_fields(self):
+        fieldset = self.fieldset
+        for field in super()._readable_fields:
+            if field.field_name in fieldset:
+                yield field
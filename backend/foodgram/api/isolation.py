@@ -0,0 +1,67 @@
+"""
+Изоляция проверок (check_*) от рабочих данных и общего кэша.
+
+Проверки создают пользователей и рецепты и очищают кэш. Данные пишутся
+во временную БД того же движка (test_<имя>, как у тестов Django), реплика
+на время проверки смотрит в неё же. Кэш подменяется кэшем в памяти
+процесса: счётчики троттлинга, токены и отношения в Redis не трогаются.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+
+from core.db.pool import close_pools
+
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'checks',
+    }
+}
+CONNECTION_KEYS = ('ENGINE', 'NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')
+
+
+def close_connections():
+    """Закрытие соединений потока и простаивающих соединений пулов."""
+    connections.close_all()
+    close_pools()
+
+
+@contextmanager
+def local_cache():
+    """Кэш в памяти процесса вместо общего на время проверки."""
+    with override_settings(CACHES=LOCAL_CACHES):
+        yield
+
+
+@contextmanager
+def test_database():
+    """
+    Временная БД с миграциями вместо основной; остальные базы
+    (реплика) на время проверки подключаются к ней же. Пулы соединений
+    привязаны к псевдониму БД, поэтому при переключении закрываются.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    old_name = connection.settings_dict['NAME']
+    mirrors = {
+        alias: {key: connections[alias].settings_dict[key]
+                for key in CONNECTION_KEYS}
+        for alias in connections.settings if alias != DEFAULT_DB_ALIAS
+    }
+    close_connections()
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        close_connections()
+        for alias in mirrors:
+            connections[alias].settings_dict.update(
+                {key: connection.settings_dict[key]
+                 for key in CONNECTION_KEYS})
+        yield
+    finally:
+        close_connections()
+        for alias, saved in mirrors.items():
+            connections[alias].settings_dict.update(saved)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        close_connections()
@@ -0,0 +1,326 @@
+"""
+Нагрузочное воспроизведение сценариев postman-коллекции:
+запросы берутся из коллекции, виртуальные пользователи выполняют
+взвешенные сценарии параллельно.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+VARIABLE = re.compile(r'{{(\w+)}}')
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+# Переменные, которые в коллекции выставляют тестовые скрипты.
+CAPTURES = {
+    'create_first_user': {'userId': lambda data: data['id']},
+    'create_second_user': {'secondUserId': lambda data: data['id']},
+    'get_token_for_first_user': {
+        'userToken': lambda data: data['auth_token'],
+    },
+    'get_token_for_second_user': {
+        'secondUserToken': lambda data: data['auth_token'],
+    },
+    'get_tag_list // User': {
+        'firstTagId': lambda data: data[0]['id'],
+        'secondTagId': lambda data: data[1]['id'],
+        'thirdTagId': lambda data: data[2]['id'],
+        'secondTagSlug': lambda data: data[1]['slug'],
+        'thirdTagSlug': lambda data: data[2]['slug'],
+    },
+    'get_ingredients_list // User': {
+        'firstIndredientId': lambda data: data[0]['id'],
+        'secondIndredientId': lambda data: data[1]['id'],
+        'ingredientNameFirstLatter': lambda data: data[0]['name'][0],
+    },
+    'create_first_recipe // Second User': {
+        'firstRecipeId': lambda data: data['id'],
+    },
+    'create_fifth_recipe // User': {
+        'fifthRecipeId': lambda data: data['id'],
+    },
+}
+
+# Подготовка: автор с рецептами, теги и ингредиенты.
+SETUP = [
+    'create_second_user',
+    'get_token_for_second_user',
+    'get_tag_list // User',
+    'get_ingredients_list // User',
+]
+SEED_RECIPE = 'create_first_recipe // Second User'
+SIGNUP = [
+    'create_first_user',
+    'get_token_for_first_user',
+    'users_me // User',
+    'set_avatar // User',
+]
+
+# Сценарий: (вес, запросы коллекции).
+SCENARIOS = {
+    'browse': (6, [
+        'get_recipes_list // No Auth',
+        'get_recipes_list_with_two_tags_param // User',
+        'get_recipe_detail // User',
+        'get_recipe_short_link // User',
+        'get_ingredients_list_with_name_filter // User',
+    ]),
+    'favorite': (3, [
+        'add_to_favorite // User',
+        'get_recipes_list_with_is_favorited_param // User',
+        'remove_from_favorite // User',
+    ]),
+    'shopping_cart': (2, [
+        'add_to_shopping_cart // User',
+        'download_shopping_cart // User',
+        'remove_from_shopping_cart // User',
+    ]),
+    'subscribe': (2, [
+        'create_subscription // User',
+        'get_subscription_list // User',
+        'delete_first_subscription // User',
+    ]),
+    'publish': (1, [
+        'create_fifth_recipe // User',
+        'get_recipes_list_with_author_param // User',
+        'delete_fifth_recipe // Second User',
+    ]),
+    'signup': (1, SIGNUP),
+}
+
+
+class ReplayError(Exception):
+    """Запрос подготовки не выполнен или коллекция не подходит."""
+
+
+def percentile(values, q):
+    """Перцентиль по методу ближайшего ранга для отсортированных значений."""
+    if not values:
+        return 0.0
+    return values[max(0, int(len(values) * q / 100 + 0.5) - 1)]
+
+
+def parse_auth(auth):
+    """Заголовок авторизации postman (apikey) или None для noauth."""
+    if not auth or auth['type'] != 'apikey':
+        return None
+    params = {param['key']: param['value'] for param in auth['apikey']}
+    return params['key'], params['value']
+
+
+class Collection:
+    """Запросы postman-коллекции по имени с унаследованной авторизацией."""
+
+    def __init__(self, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.variables = {
+            variable['key']: variable['value']
+            for variable in data.get('variable', [])
+        }
+        self.requests = {}
+        self.collect(data['item'], data.get('auth'))
+
+    def collect(self, items, auth):
+        for item in items:
+            if 'item' in item:
+                self.collect(item['item'], item.get('auth') or auth)
+                continue
+            request = item['request']
+            body = request.get('body') or {}
+            self.requests.setdefault(item['name'], {
+                'method': request['method'],
+                'url': request['url']['raw'],
+                'auth': parse_auth(request.get('auth') or auth),
+                'body': body.get('raw'),
+            })
+
+    def __getitem__(self, name):
+        try:
+            return self.requests[name]
+        except KeyError:
+            raise ReplayError(f'В коллекции нет запроса «{name}».')
+
+
+class Stats:
+    """Результаты запросов, сгруппированные по эндпоинтам."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = Counter()
+        self.lock = threading.Lock()
+        self.started = self.finished = None
+
+    def add(self, endpoint, status, latency, queries, db_ms):
+        with self.lock:
+            self.samples[endpoint].append((status, latency, queries, db_ms))
+            self.statuses[status] += 1
+
+    def summarize(self):
+        elapsed = (self.finished - self.started) or 1e-9
+        rows = {}
+        everything = []
+        for endpoint, samples in sorted(self.samples.items()):
+            rows[endpoint] = self.summarize_samples(samples, elapsed)
+            everything.extend(samples)
+        return rows, self.summarize_samples(everything, elapsed)
+
+    @staticmethod
+    def summarize_samples(samples, elapsed):
+        latencies = sorted(latency * 1000 for _, latency, _, _ in samples)
+        errors = sum(1 for status, *_ in samples
+                     if status is None or status >= 400)
+        queries = sum(queries or 0 for _, _, queries, _ in samples)
+        db_ms = sum(db_ms or 0 for *_, db_ms in samples)
+        count = len(samples)
+        return {
+            'requests': count,
+            'rps': round(count / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'errors': errors,
+            'error_rate': round(errors / count * 100, 2) if count else 0.0,
+            'queries': queries,
+            'queries_per_request': round(queries / count, 1) if count else 0,
+            'db_ms_per_request': round(db_ms / count, 2) if count else 0,
+        }
+
+
+class VirtualUser:
+    """
+    Пользователь со своими переменными коллекции и HTTP-сессией.
+    Учётные данные уникальны для каждой регистрации.
+    """
+
+    def __init__(self, collection, base_url, variables, prefix, number,
+                 rng, stats=None, timeout=30.0):
+        self.collection = collection
+        self.session = requests.Session()
+        self.variables = {**collection.variables, **variables,
+                          'baseUrl': base_url.rstrip('/')}
+        self.prefix = prefix
+        self.number = number
+        self.rng = rng
+        self.stats = stats
+        self.timeout = timeout
+        self.registrations = 0
+
+    def new_identity(self, role='first'):
+        self.registrations += 1
+        username = f'{self.prefix}-{self.number}-{self.registrations}'
+        keys = {
+            'first': ('username', 'email'),
+            'second': ('secondUserUsername', 'secondUserEmail'),
+        }[role]
+        self.variables[keys[0]] = json.dumps(username)
+        self.variables[keys[1]] = json.dumps(f'{username}@example.com')
+
+    def render(self, template):
+        def replace(match):
+            try:
+                return str(self.variables[match[1]])
+            except KeyError:
+                raise ReplayError(
+                    f'Не задана переменная коллекции «{match[1]}».')
+        return VARIABLE.sub(replace, template)
+
+    def send(self, name):
+        request = self.collection[name]
+        headers = {}
+        if request['auth']:
+            header, value = request['auth']
+            headers[header] = self.render(value)
+        body = request['body']
+        if body is not None:
+            body = self.render(body).encode()
+            headers['Content-Type'] = 'application/json'
+        url = self.render(request['url'])
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                request['method'], url, data=body, headers=headers,
+                timeout=self.timeout)
+        except requests.RequestException:
+            response = None
+        latency = time.perf_counter() - started
+        if self.stats is not None:
+            self.record(request, response, latency)
+        if response is not None and response.ok and name in CAPTURES:
+            data = response.json()
+            for variable, extract in CAPTURES[name].items():
+                try:
+                    self.variables[variable] = extract(data)
+                except (LookupError, TypeError):
+                    pass
+        return response
+
+    def record(self, request, response, latency):
+        endpoint = '{} {}'.format(
+            request['method'],
+            request['url'].replace('{{baseUrl}}', '', 1))
+        queries = db_ms = None
+        if response is not None:
+            match = SERVER_TIMING_DB.search(
+                response.headers.get('Server-Timing', ''))
+            if match:
+                db_ms, queries = float(match[1]), int(match[2])
+        self.stats.add(endpoint,
+                       response.status_code if response is not None else None,
+                       latency, queries, db_ms)
+
+    def run_scenario(self, name):
+        if name == 'signup':
+            self.new_identity()
+        for request_name in SCENARIOS[name][1]:
+            response = self.send(request_name)
+            if response is None or not response.ok:
+                break
+
+    def run(self, deadline, recipe_ids):
+        """Регистрация и взвешенные сценарии до наступления deadline."""
+        names = list(SCENARIOS)
+        weights = [SCENARIOS[name][0] for name in names]
+        self.run_scenario('signup')
+        while time.monotonic() < deadline:
+            self.variables['firstRecipeId'] = self.rng.choice(recipe_ids)
+            self.run_scenario(self.rng.choices(names, weights)[0])
+
+
+def prepare(collection, base_url, prefix, recipes, timeout=30.0):
+    """
+    Автор с рецептами, на которых работают сценарии, теги и ингредиенты.
+    Возвращает общие переменные и идентификаторы рецептов.
+    """
+    user = VirtualUser(collection, base_url, {}, prefix, 0,
+                       random.Random(), timeout=timeout)
+    user.new_identity('second')
+    for name in SETUP:
+        if 'secondUserToken' in user.variables:
+            user.variables['userToken'] = user.variables['secondUserToken']
+        response = user.send(name)
+        if response is None or not response.ok:
+            raise ReplayError(f'Запрос «{name}» не выполнен: '
+                              f'{getattr(response, "status_code", None)}.')
+        if name in CAPTURES and not set(CAPTURES[name]) <= set(
+                user.variables):
+            raise ReplayError('Для сценариев нужны минимум 3 тега '
+                              'и 2 ингредиента.')
+    recipe_ids = []
+    for _ in range(recipes):
+        response = user.send(SEED_RECIPE)
+        if response is None or response.status_code != 201:
+            raise ReplayError(f'Рецепт не создан: '
+                              f'{getattr(response, "status_code", None)}.')
+        recipe_ids.append(user.variables['firstRecipeId'])
+    shared = {
+        name: user.variables[name]
+        for captures in CAPTURES.values() for name in captures
+        if name in user.variables and not name.endswith('Token')
+    }
+    shared['thirdUserId'] = shared['secondUserId']
+    return shared, recipe_ids
@@ -0,0 +1,124 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from recipes.models import Recipe, RecipeShortLink, Tag
+
+from api.benchmarks import BENCHMARKS, run_benchmarks
+from core.fake_data import DatasetGenerator
+from core.models import CustomUser as User
+
+PREFIX = 'bench'
+SHORT_LINKS = 100
+
+
+class Command(BaseCommand):
+    help = ('Micro-benchmarks of serializers, filters, shopping list '
+            'aggregation and short links on a deterministic dataset')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS))
+        parser.add_argument('--output', type=str,
+                            help='Файл для сохранения результатов (JSON).')
+        parser.add_argument('--baseline', type=str,
+                            help='Результаты предыдущего прогона (JSON).')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Допустимое замедление относительно '
+                                 'baseline, %%.')
+
+    def prepare_dataset(self, options):
+        existing = User.objects.filter(username__startswith=f'{PREFIX}-')
+        if existing.count() >= options['users']:
+            self.stdout.write('Используется существующий набор данных.')
+            return
+        if existing.exists():
+            raise CommandError(
+                'Набор данных неполный: очистите БД или увеличьте --users.')
+        self.stdout.write('Генерация набора данных...')
+        DatasetGenerator(
+            users=options['users'], recipes=options['recipes'],
+            seed=options['seed'], prefix=PREFIX, stdout=self.stdout
+        ).generate()
+
+    def get_context(self, options):
+        users = User.objects.filter(username__startswith=f'{PREFIX}-')
+        viewer = users.annotate(
+            relations=Count('subscriber', distinct=True)
+            + Count('shopping_list', distinct=True)
+        ).order_by('-relations', 'id').first()
+        author = users.annotate(
+            total=Count('recipes')).order_by('-total', 'id').first()
+        short_links = []
+        for recipe in Recipe.objects.order_by('id')[:SHORT_LINKS]:
+            link, _ = RecipeShortLink.objects.get_or_create(recipe=recipe)
+            short_links.append(link.short_link)
+        return {
+            'viewer': viewer,
+            'author': author,
+            'tags': list(Tag.objects.order_by('id').values_list(
+                'slug', flat=True)),
+            'short_links': short_links,
+            'page_size': options['page_size'],
+        }
+
+    def compare(self, results, baseline_path, threshold):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            change = ((result['median_ms'] - previous['median_ms'])
+                      / previous['median_ms'] * 100)
+            line = (f'{name:<28} {previous["median_ms"]:>10.2f} -> '
+                    f'{result["median_ms"]:>10.2f} мс ({change:+.1f}%), '
+                    f'запросов {previous["queries"]} -> {result["queries"]}')
+            if change > threshold or result['queries'] > previous['queries']:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
+
+    def handle(self, *args, **options):
+        self.prepare_dataset(options)
+        context = self.get_context(options)
+        results = run_benchmarks(context, options['only'], options['repeat'])
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<28} {result["median_ms"]:>10.2f} мс '
+                f'{result["queries"]:>5} запросов '
+                f'{result["peak_memory_kb"]:>10.1f} КБ'
+            )
+        report = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'users': options['users'],
+                'recipes': options['recipes'],
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'page_size': options['page_size'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}.')
+        if options['baseline']:
+            regressions = self.compare(
+                results, options['baseline'], options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Регрессия производительности: ' + ', '.join(regressions))
@@ -0,0 +1,203 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from recipes import documents
+from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Subscribe, Tag, TimelineEntry)
+from rest_framework.authtoken.models import Token
+
+from api.isolation import local_cache, test_database
+from core import authentication
+from core.db.instrumentation import (QueryBudgetExceeded, assert_query_budget,
+                                     get_query_budget)
+from core.models import CustomUser as User
+
+PREFIX = 'budget'
+AUTHORS = 8
+RECIPES_PER_AUTHOR = 6
+TAGS = 3
+INGREDIENTS = 8
+PAGE = 'limit=20'
+PNG = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAA'
+       'AADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class Command(BaseCommand):
+    help = ('Checking query budgets (QUERY_BUDGETS) of API endpoints '
+            'on generated data with full pages, recipes without documents '
+            'and cold caches, in a temporary test database with a '
+            'process-local cache')
+
+    @transaction.atomic
+    def create_data(self):
+        tags = Tag.objects.bulk_create(
+            [Tag(name=f'{PREFIX}-tag-{i}', slug=f'{PREFIX}-tag-{i}')
+             for i in range(TAGS)]
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            [Ingredient(name=f'{PREFIX}-ingredient-{i}',
+                        measurement_unit='г')
+             for i in range(INGREDIENTS)]
+        )
+        viewer, *authors = User.objects.bulk_create(
+            [
+                User(username=f'{PREFIX}-user-{i}',
+                     email=f'{PREFIX}-user-{i}@example.com',
+                     first_name='Имя', last_name='Фамилия', password='!',
+                     avatar=f'users/images/{PREFIX}.png' if i % 2 else '')
+                for i in range(AUTHORS + 1)
+            ]
+        )
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(author=author, name=f'Рецепт {i}', text='Описание',
+                       image=f'recipes/images/{PREFIX}.png', cooking_time=10)
+                for author in authors for i in range(RECIPES_PER_AUTHOR)
+            ]
+        )
+        Recipe.tags.through.objects.bulk_create(
+            [Recipe.tags.through(recipe=recipe, tag=tag)
+             for recipe in recipes for tag in tags]
+        )
+        RecipeIngredients.objects.bulk_create(
+            [RecipeIngredients(recipe=recipe, ingredient=ingredient, amount=2)
+             for recipe in recipes for ingredient in ingredients]
+        )
+        Subscribe.objects.bulk_create(
+            [Subscribe(user=viewer, author=author) for author in authors]
+        )
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user=viewer, recipe=recipe, author=recipe.author)
+             for recipe in recipes]
+        )
+        Favorites.objects.bulk_create(
+            [Favorites(user=viewer, recipe=recipe) for recipe in recipes[::2]]
+        )
+        ShoppingCart.objects.bulk_create(
+            [ShoppingCart(user=viewer, recipe=recipe)
+             for recipe in recipes[::3]]
+        )
+        documents.rebuild([recipe.id for recipe in recipes])
+        return viewer, authors, recipes, tags, ingredients
+
+    def get_cases(self, viewer, authors, recipes, tags, ingredients):
+        """(ключ бюджета, метод, путь, тело запроса, пользователь)."""
+        recipe = {
+            'name': 'Новый рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': PNG, 'tags': [tag.id for tag in tags],
+            'ingredients': [{'id': ingredient.id, 'amount': 3}
+                            for ingredient in ingredients],
+        }
+        tag_filter = '&'.join(f'tags={tag.slug}' for tag in tags)
+        author, recipe_id = authors[0], recipes[0].id
+        anonymous = [
+            ('GET api:recipes-list', 'get', f'/api/recipes/?{PAGE}', None),
+            ('GET api:recipes-detail', 'get',
+             f'/api/recipes/{recipe_id}/', None),
+        ]
+        by_author = [
+            ('PATCH api:recipes-detail', 'patch',
+             f'/api/recipes/{recipes[1].id}/', {**recipe, 'image': None}),
+            ('DELETE api:recipes-detail', 'delete',
+             f'/api/recipes/{recipes[2].id}/', None),
+        ]
+        by_viewer = [
+            ('GET api:recipes-list', 'get', f'/api/recipes/?{PAGE}', None),
+            ('GET api:recipes-list', 'get',
+             f'/api/recipes/?is_favorited=1&{PAGE}', None),
+            ('GET api:recipes-list', 'get',
+             f'/api/recipes/?{tag_filter}&{PAGE}', None),
+            ('GET api:recipes-list', 'get',
+             f'/api/recipes/?author={author.id}&{PAGE}', None),
+            ('GET api:recipes-detail', 'get',
+             f'/api/recipes/{recipe_id}/', None),
+            ('GET api:users-subscriptions', 'get',
+             f'/api/users/subscriptions/?{PAGE}', None),
+            ('GET api:users-subscriptions', 'get',
+             f'/api/users/subscriptions/?recipes_limit=3&{PAGE}', None),
+            ('GET api:users-feed', 'get', f'/api/users/feed/?{PAGE}', None),
+            ('GET api:download_shopping_cart', 'get',
+             '/api/recipes/download_shopping_cart/', None),
+            ('GET api:customuser-list', 'get', f'/api/users/?{PAGE}', None),
+            ('GET api:customuser-detail', 'get',
+             f'/api/users/{author.id}/', None),
+            ('GET api:customuser-me', 'get', '/api/users/me/', None),
+            ('GET api:tags-list', 'get', '/api/tags/', None),
+            ('GET api:ingredients-list', 'get',
+             f'/api/ingredients/?name={PREFIX}', None),
+            ('POST api:recipes-list', 'post', '/api/recipes/', recipe),
+            ('POST api:recipes-favorite', 'post',
+             f'/api/recipes/{recipes[1].id}/favorite/', None),
+            ('DELETE api:recipes-favorite', 'delete',
+             f'/api/recipes/{recipe_id}/favorite/', None),
+            ('POST api:recipes-shopping-cart', 'post',
+             f'/api/recipes/{recipes[1].id}/shopping_cart/', None),
+            ('DELETE api:users-subscribe', 'delete',
+             f'/api/users/{authors[1].id}/subscribe/', None),
+            ('POST api:users-subscribe', 'post',
+             f'/api/users/{authors[1].id}/subscribe/', None),
+            ('POST api:customuser-list', 'post', '/api/users/', {
+                'username': f'{PREFIX}-new', 'email': f'{PREFIX}-new@ex.com',
+                'first_name': 'Имя', 'last_name': 'Фамилия',
+                'password': 'Budget-password-42',
+            }),
+        ]
+        return ([(*case, None) for case in anonymous]
+                + [(*case, author) for case in by_author]
+                + [(*case, viewer) for case in by_viewer])
+
+    def get_client(self, user):
+        if user is None:
+            return Client()
+        token, _ = Token.objects.get_or_create(user=user)
+        return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def prepare(self, recipes):
+        """Холодные кэши (токены, отношения) и рецепты без документов."""
+        cache.clear()
+        authentication._local.clear()
+        Recipe.all_objects.filter(
+            id__in=[recipe.id for recipe in recipes[::2]]
+        ).update(document=None)
+
+    def check_cases(self, cases, recipes):
+        failures = []
+        for key, method, path, data, user in cases:
+            client = self.get_client(user)
+            self.prepare(recipes)
+            error = None
+            try:
+                with assert_query_budget(key) as recorder:
+                    response = getattr(client, method)(
+                        path, data, content_type='application/json')
+            except QueryBudgetExceeded as exceeded:
+                error = str(exceeded)
+            else:
+                if response.status_code >= 400:
+                    error = f'{key} {path}: HTTP {response.status_code}'
+            line = (f'{key:<32} {path[:48]:<48} '
+                    f'{recorder.count:>3} / {get_query_budget(key)}')
+            if error:
+                failures.append(error)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return failures
+
+    def handle(self, *args, **options):
+        with test_database(), local_cache():
+            viewer, *data = self.create_data()
+            cases = self.get_cases(viewer, *data)
+            missing = {key for key, *_ in cases} - set(settings.QUERY_BUDGETS)
+            if missing:
+                raise CommandError('Нет бюджетов: ' + ', '.join(missing))
+            # Превышения собирает проверка, а не middleware.
+            with override_settings(QUERY_BUDGET_STRICT=False):
+                failures = self.check_cases(cases, data[1])
+        if failures:
+            raise CommandError('Превышены бюджеты запросов: '
+                               + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(
+            f'Бюджеты запросов соблюдены ({len(cases)}).'))
@@ -0,0 +1,267 @@
+import json
+from itertools import combinations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.test import Client
+from recipes import ranking
+from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredients,
+                            RecipeRanking, RecipeShortLink, ShoppingCart,
+                            Subscribe, Tag, TimelineEntry)
+from rest_framework.authtoken.models import Token
+
+from core.constants import QueryPlanLimits
+from core.fake_data import DatasetGenerator
+from core.models import CustomUser as User
+
+SEEDED_MODELS = (
+    User, Recipe, Recipe.tags.through, RecipeIngredients, Favorites,
+    ShoppingCart, Subscribe, RecipeShortLink, TimelineEntry, RecipeRanking,
+)
+RECIPE_FILTERS = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+TIMELINE_RECIPES = 5
+# Последовательное чтение, которое нужно самому запросу.
+ALLOWED_SEQ_SCANS = {
+    # COUNT(*) всего списка для постраничного вывода.
+    ('recipes', 'recipes_recipe'),
+    ('recipes?', 'recipes_recipe'),
+    # COUNT(*) рецептов с тегом: тег есть у заметной доли рецептов.
+    ('recipes?tags', 'recipes_recipe'),
+    ('recipes?tags', 'recipes_recipe_tags'),
+}
+
+
+class StatementRecorder:
+    """Обёртка выполнения запросов, собирающая SELECT с параметрами."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def iter_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from iter_nodes(child)
+
+
+class Command(BaseCommand):
+    help = ('Checking PostgreSQL query plans of hot API endpoints: '
+            'no sequential scans over large tables and no cost jumps '
+            'against the baseline; seeded data is rolled back afterwards')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int,
+                            default=QueryPlanLimits.SEED_USERS)
+        parser.add_argument('--recipes', type=int,
+                            default=QueryPlanLimits.SEED_RECIPES)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-seed', action='store_true',
+                            help='Проверять на данных текущей БД.')
+        parser.add_argument('--large-table-rows', type=int,
+                            default=QueryPlanLimits.LARGE_TABLE_ROWS,
+                            help='С какого числа строк таблица большая.')
+        parser.add_argument('--cost-factor', type=float,
+                            default=QueryPlanLimits.COST_FACTOR,
+                            help='Допустимый рост стоимости '
+                                 'относительно эталона.')
+        parser.add_argument('--baseline',
+                            default=settings.BASE_DIR / 'query_plans.json')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Записать стоимости как эталон.')
+
+    def vacuum(self):
+        """
+        Место строк прошлых откаченных запусков освобождается, иначе
+        таблицы разрастаются и стоимость полного чтения растёт.
+        """
+        tables = ', '.join(
+            connection.ops.quote_name(model._meta.db_table)
+            for model in SEEDED_MODELS)
+        with connection.cursor() as cursor:
+            cursor.execute(f'VACUUM {tables}')
+
+    def seed(self, options):
+        DatasetGenerator(
+            users=options['users'], recipes=options['recipes'],
+            seed=options['seed'], prefix='plan',
+        ).generate()
+        quote = connection.ops.quote_name
+        recipes = quote(Recipe._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(RecipeShortLink._meta.db_table)} '
+                f'(recipe_id, short_link) '
+                f'SELECT id, left(md5(id::text), 6) FROM {recipes} '
+                f'ON CONFLICT DO NOTHING'
+            )
+            cursor.execute(
+                f'INSERT INTO {quote(TimelineEntry._meta.db_table)} '
+                f'(user_id, recipe_id, author_id) '
+                f'SELECT subscribe.user_id, recipe.id, recipe.author_id '
+                f'FROM {quote(Subscribe._meta.db_table)} subscribe '
+                f'CROSS JOIN LATERAL (SELECT id, author_id FROM {recipes} '
+                f'WHERE author_id = subscribe.author_id '
+                f'ORDER BY pub_date DESC LIMIT %s) recipe '
+                f'ON CONFLICT DO NOTHING',
+                [TIMELINE_RECIPES]
+            )
+        ranking.refresh(
+            Favorites.objects.aggregate(latest=Max('created'))['latest'])
+
+    def get_table_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute(
+                "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")
+            return dict(cursor.fetchall())
+
+    def get_cases(self):
+        viewer = Favorites.objects.values('user').annotate(
+            total=Count('id')).order_by('-total').first()
+        author_id = Recipe.objects.values_list('author', flat=True).first()
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        short_link = RecipeShortLink.objects.values_list(
+            'recipe_id', 'short_link').first()
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        if None in (viewer, author_id, tag, short_link, ingredient):
+            raise CommandError('Нужны рецепты, теги, ингредиенты, '
+                               'избранное и короткие ссылки.')
+        viewer_id = viewer['user']
+        recipe_id, short_hash = short_link
+        prefix = ingredient[:2]
+        values = {
+            'author': author_id,
+            'tags': tag,
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+        }
+        cases = [('recipes', '/api/recipes/', None)]
+        for size in range(len(RECIPE_FILTERS) + 1):
+            for names in combinations(RECIPE_FILTERS, size):
+                query = '&'.join(f'{name}={values[name]}' for name in names)
+                cases.append(('recipes?' + '&'.join(names),
+                              f'/api/recipes/?{query}', viewer_id))
+        cases += [
+            ('popular', '/api/recipes/?ordering=popular', viewer_id),
+            ('popular&tags', f'/api/recipes/?ordering=popular&tags={tag}',
+             viewer_id),
+            ('subscriptions', '/api/users/subscriptions/', viewer_id),
+            ('feed', '/api/users/feed/', viewer_id),
+            ('shopping_cart', '/api/recipes/download_shopping_cart/',
+             viewer_id),
+            ('short_link', f'/api/s/{short_hash}/', None),
+            ('get_link', f'/api/recipes/{recipe_id}/get-link/', None),
+            ('ingredients', f'/api/ingredients/?name={prefix}', None),
+        ]
+        return cases
+
+    def get_statements(self, path, viewer_id):
+        headers = {}
+        if viewer_id is not None:
+            token, _ = Token.objects.get_or_create(user_id=viewer_id)
+            headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        recorder = StatementRecorder()
+        with connection.execute_wrapper(recorder):
+            response = Client().get(path, **headers)
+        if response.status_code >= 400:
+            raise CommandError(f'{path}: HTTP {response.status_code}')
+        return [(sql, params) for sql, params in recorder.statements
+                if 'authtoken_token' not in sql]
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+
+    def get_dataset(self, options):
+        """
+        Параметры данных и основная версия PostgreSQL: модель стоимости
+        планировщика меняется между версиями.
+        """
+        dataset = {name: options[name]
+                   for name in ('users', 'recipes', 'seed')}
+        dataset['postgres'] = connection.pg_version // 10000
+        return dataset
+
+    def load_baseline(self, options):
+        """Эталонные стоимости, если они сняты на тех же данных и версии."""
+        if options['update_baseline']:
+            return {}
+        try:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            return {}
+        if options['no_seed'] or (
+                baseline['dataset'] != self.get_dataset(options)):
+            self.stdout.write('Эталон снят на других данных или другой '
+                              'версии PostgreSQL, стоимости '
+                              'не сравниваются.')
+            return {}
+        return baseline['costs']
+
+    def check_plans(self, options, baseline, table_rows):
+        costs, failures = {}, []
+        for name, path, viewer_id in self.get_cases():
+            for number, (sql, params) in enumerate(
+                    self.get_statements(path, viewer_id), start=1):
+                key = f'{name} #{number}'
+                plan = self.explain(sql, params)
+                costs[key] = cost = plan['Total Cost']
+                problems = [
+                    f'Seq Scan {relation}'
+                    for relation in (
+                        node['Relation Name'] for node in iter_nodes(plan)
+                        if node['Node Type'] == 'Seq Scan')
+                    if table_rows.get(relation, 0)
+                    >= options['large_table_rows']
+                    and (name, relation) not in ALLOWED_SEQ_SCANS
+                ]
+                if key in baseline and (
+                        cost > baseline[key] * options['cost_factor']):
+                    problems.append(f'стоимость {baseline[key]:.0f} → '
+                                    f'{cost:.0f}')
+                line = f'{key:<50} {cost:>12.1f}'
+                if problems:
+                    failures.append(f'{key}: {", ".join(problems)}')
+                    self.stdout.write(self.style.ERROR(
+                        f'{line}  {", ".join(problems)}'))
+                else:
+                    self.stdout.write(line)
+        return costs, failures
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Планы запросов проверяются '
+                               'только в PostgreSQL.')
+        if options['no_seed'] and options['update_baseline']:
+            raise CommandError('Эталон снимается только '
+                               'на сгенерированных данных.')
+        baseline = self.load_baseline(options)
+        if not options['no_seed']:
+            self.vacuum()
+        with transaction.atomic():
+            if not options['no_seed']:
+                self.seed(options)
+            costs, failures = self.check_plans(
+                options, baseline, self.get_table_rows())
+            transaction.set_rollback(True)
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as file:
+                json.dump({'dataset': self.get_dataset(options),
+                           'costs': costs}, file, indent=2)
+                file.write('\n')
+            self.stdout.write(f'Эталон записан: {options["baseline"]}.')
+        if failures:
+            raise CommandError('Планы запросов не прошли проверку: '
+                               + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(
+            f'Планы запросов в порядке ({len(costs)}).'))
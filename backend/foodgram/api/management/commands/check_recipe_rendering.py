@@ -0,0 +1,217 @@
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes import documents, relations, timeline
+from recipes.models import (Favorites, Ingredient, Recipe, ShoppingCart,
+                            Subscribe, Tag)
+from rest_framework import mixins
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from django.test import TestCase
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.annotations import is_subscribed
+from api.fieldsets import Fieldset
+from api.isolation import local_cache
+from api.serializers import RecipeSerializer
+from api.views import CustomUserViewSet, RecipeViewSet
+from core.fake_data import DatasetGenerator
+from core.models import CustomUser as User
+from core.pagination import KeysetPagination
+
+PREFIX = 'render'
+SPECIAL_TEXT = ('Строка\u2028разделитель\u2029 "кавычки" \\ / '
+                '<b>&</b>\n\t\U0001F600')
+FEED_PATH = '/api/users/feed/'
+FEED_KWARGS = {'pagination_class': KeysetPagination,
+               'permission_classes': [IsAuthenticated]}
+
+
+class LegacyRecipeViewSet(RecipeViewSet):
+    """Чтение рецептов через RecipeSerializer и JSONRenderer."""
+    renderer_classes = [JSONRenderer]
+    list = mixins.ListModelMixin.list
+    retrieve = mixins.RetrieveModelMixin.retrieve
+
+
+class LegacyUserViewSet(CustomUserViewSet):
+    """Лента через RecipeSerializer."""
+
+    def feed(self, request):
+        queryset = timeline.get_feed_queryset(request.user)
+        if Fieldset.from_request(request).includes('author.is_subscribed'):
+            queryset = queryset.annotate(author_is_subscribed=is_subscribed(
+                request.user, 'author'))
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeSerializer(
+            page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+
+class Command(BaseCommand):
+    help = ('Checking that the values()-based recipe list, detail '
+            'and feed rendering matches RecipeSerializer output byte '
+            'for byte; '
+            'the data is rolled back afterwards and caches stay '
+            'process-local')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=30)
+        parser.add_argument('--recipes', type=int, default=60)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def create_data(self, options):
+        DatasetGenerator(
+            users=options['users'], recipes=options['recipes'],
+            seed=options['seed'], prefix=PREFIX, favorites_per_user=10,
+            cart_per_user=5, subscriptions_per_user=5,
+        ).generate()
+        users = User.objects.filter(username__startswith=f'{PREFIX}-')
+        ids = list(users.values_list('id', flat=True))
+        users.filter(id__in=ids[::2]).update(
+            avatar='users/avatars/render.png')
+        recipes = Recipe.objects.filter(author__in=users)
+        Recipe.objects.filter(id__in=recipes.values('id')[:3]).update(
+            text=SPECIAL_TEXT, name='Рецепт "в кавычках"')
+        documents.rebuild(recipes.values_list('id', flat=True))
+        self.change_related(users, recipes)
+        return users, recipes
+
+    def change_related(self, users, recipes):
+        """Изменения, после которых документы пересобираются сигналами."""
+        author = User.objects.get(id=recipes[0].author_id)
+        author.first_name = 'Изменённое имя'
+        author.avatar = 'users/avatars/changed.png'
+        author.save()
+        tag = recipes[1].tags.first()
+        tag.name = f'{tag.name} (изменён)'
+        tag.save()
+        ingredient = Ingredient.objects.get(
+            id=recipes[2].recipeingredients.first().ingredient_id)
+        ingredient.measurement_unit = 'кг'
+        ingredient.save()
+        recipes[3].tags.clear()
+        recipes[4].recipeingredients.first().delete()
+
+    def get_viewers(self, users):
+        viewer = max(users, key=lambda user: (
+            Favorites.objects.filter(user=user).count()
+            + ShoppingCart.objects.filter(user=user).count()
+            + Subscribe.objects.filter(user=user).count()
+        ))
+        return [None, viewer]
+
+    def toggle_relations(self, viewer, recipes):
+        """
+        Переключение избранного, корзины и подписок через действия API,
+        в том числе пакетные, при прогретом кэше отношений; кэш должен
+        совпасть с БД.
+        """
+        relations.get_relations(viewer)
+        client = APIClient()
+        client.force_authenticate(viewer)
+        toggles = []
+        others = [r for r in recipes if r.author_id != viewer.id]
+        for recipe in others[:4]:
+            for path, model in (('favorite', Favorites),
+                                ('shopping_cart', ShoppingCart)):
+                exists = model.objects.filter(
+                    user=viewer, recipe=recipe).exists()
+                toggles.append((
+                    'delete' if exists else 'post',
+                    f'/api/recipes/{recipe.id}/{path}/', None))
+        for author_id in {r.author_id for r in recipes[:20]} - {viewer.id}:
+            exists = Subscribe.objects.filter(
+                user=viewer, author_id=author_id).exists()
+            toggles.append((
+                'delete' if exists else 'post',
+                f'/api/users/{author_id}/subscribe/', None))
+        ids = {'ids': [recipe.id for recipe in others[4:14]]}
+        for path in ('favorite', 'shopping_cart'):
+            toggles += [('post', f'/api/recipes/{path}/bulk/', ids),
+                        ('delete', f'/api/recipes/{path}/bulk/',
+                         {'ids': ids['ids'][::2]})]
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            for method, path, data in toggles:
+                response = getattr(client, method)(path, data, format='json')
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{method.upper()} {path}: {response.status_code}')
+        cached = relations.get_relations(viewer).ids
+        if cached != relations.load(viewer.id).ids:
+            raise CommandError('Кэш отношений расходится с БД.')
+
+    def get_paths(self, recipes):
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        paths = [
+            '/api/recipes/',
+            '/api/recipes/?page=2',
+            '/api/recipes/?limit=20&page=2',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            '/api/recipes/?tags=' + '&tags='.join(tags),
+            f'/api/recipes/?author={recipes[0].author_id}',
+            '/api/recipes/?page=1000',
+            '/api/recipes/0/',
+            '/api/recipes/?fields=id,name,image,cooking_time',
+            '/api/recipes/?fields=author.username,tags.slug,is_favorited',
+            '/api/recipes/?omit=ingredients,text,author.email',
+            '/api/recipes/?is_favorited=1&fields=id&omit=name',
+            '/api/recipes/?fields=id,is_favorited,is_in_shopping_cart',
+            f'/api/recipes/{recipes[0].id}/?fields=id,ingredients.name',
+            f'/api/recipes/{recipes[0].id}/?omit=author',
+            FEED_PATH,
+            f'{FEED_PATH}?limit=50',
+            f'{FEED_PATH}?fields=id,author.is_subscribed,is_favorited',
+            f'{FEED_PATH}?omit=ingredients,text',
+        ]
+        paths += [f'/api/recipes/{recipe.id}/' for recipe in recipes[:10]]
+        return paths
+
+    def render(self, view_class, path, user):
+        headers = {}
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        request = APIRequestFactory().get(path, **headers)
+        pk = urlsplit(path).path.rstrip('/').split('/')[-1]
+        if path.startswith(FEED_PATH):
+            response = view_class.as_view(
+                {'get': 'feed'}, **FEED_KWARGS)(request)
+        elif pk.isdigit():
+            view = view_class.as_view({'get': 'retrieve'})
+            response = view(request, pk=pk)
+        else:
+            response = view_class.as_view({'get': 'list'})(request)
+        return response.status_code, response.render().content
+
+    def handle(self, *args, **options):
+        mismatches = []
+        checked = 0
+        with transaction.atomic(), local_cache():
+            users, recipes = self.create_data(options)
+            viewers = self.get_viewers(users)
+            self.toggle_relations(viewers[-1], list(recipes))
+            timeline.backfill(viewers[-1], *Subscribe.objects.filter(
+                user=viewers[-1]).values_list('author_id', flat=True))
+            for user in viewers:
+                for path in self.get_paths(list(recipes)):
+                    legacy, view_class = (
+                        (LegacyUserViewSet, CustomUserViewSet)
+                        if path.startswith(FEED_PATH)
+                        else (LegacyRecipeViewSet, RecipeViewSet))
+                    expected = self.render(legacy, path, user)
+                    actual = self.render(view_class, path, user)
+                    checked += 1
+                    if expected != actual:
+                        mismatches.append(f'{path} ({user or "аноним"})')
+                        self.stdout.write(self.style.ERROR(
+                            f'{path}:\n  {expected}\n  {actual}'))
+            transaction.set_rollback(True)
+        if mismatches:
+            raise CommandError('Ответы различаются: '
+                               + '; '.join(mismatches))
+        self.stdout.write(self.style.SUCCESS(
+            f'Ответы совпадают побайтно ({checked}).'))
@@ -0,0 +1,184 @@
+import os
+from collections import Counter
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.test import Client
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+
+from api.isolation import local_cache
+from core.db.routers import REPLICA_DB_ALIAS, use_replica
+from core.models import CustomUser as User
+
+ALIASES = (DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS)
+
+
+class AliasRecorder:
+    """Обёртка выполнения запросов, считающая запросы по базам."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            self.counts[alias] += 1
+            return execute(sql, params, many, context)
+        return record
+
+    @contextmanager
+    def record(self):
+        self.counts.clear()
+        wrappers = [connections[alias].execute_wrapper(self.wrapper(alias))
+                    for alias in ALIASES]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            yield self
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+
+def reset_connections():
+    """Закрытие соединений потока: следующие откроются по новым настройкам."""
+    connections.close_all()
+    for alias in connections.settings:
+        if hasattr(connections._connections, alias):
+            del connections[alias]
+
+
+@contextmanager
+def sqlite_databases(directory):
+    """Основная БД и реплика — файлы SQLite на время проверки."""
+    saved = connections.settings
+    reset_connections()
+    connections.settings = connections.configure_settings({
+        alias: {'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory, f'{alias}.sqlite3')}
+        for alias in ALIASES
+    })
+    try:
+        yield
+    finally:
+        reset_connections()
+        connections.settings = saved
+
+
+class Command(BaseCommand):
+    help = ('Checking read replica routing on temporary SQLite primary '
+            'and replica databases with a process-local cache: reads of '
+            'safe requests go to the replica, writes and atomic blocks to '
+            'the primary, and a client is pinned to the primary after '
+            'a write')
+
+    def get(self, client, path):
+        with AliasRecorder().record() as recorder:
+            response = client.get(path)
+        return response, recorder.counts
+
+    def post(self, client, path):
+        with AliasRecorder().record() as recorder:
+            response = client.post(path)
+        return response, recorder.counts
+
+    def create_data(self):
+        """Данные только в основной БД: реплика остаётся пустой."""
+        author, viewer, other = User.objects.bulk_create(
+            [User(username=f'replica-{i}', email=f'replica-{i}@example.com',
+                  password='!') for i in range(3)]
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            image='recipes/images/replica.png', cooking_time=10)
+        clients = []
+        for user in (viewer, other):
+            token = Token.objects.create(user=user)
+            clients.append(Client(HTTP_AUTHORIZATION=f'Token {token.key}'))
+        return recipe, clients
+
+    def get_results(self):
+        recipe, (viewer, other) = self.create_data()
+        results = []
+
+        response, counts = self.get(Client(), '/api/recipes/')
+        results.append((
+            'GET анонима читает реплику',
+            response.status_code == 200 and response.json()['count'] == 0
+            and counts[REPLICA_DB_ALIAS] and not counts[DEFAULT_DB_ALIAS],
+            counts))
+
+        response, counts = self.get(other, '/api/recipes/')
+        results.append((
+            'GET с токеном: токен — с основной, остальное — с реплики',
+            response.status_code == 200 and counts[REPLICA_DB_ALIAS]
+            and counts[DEFAULT_DB_ALIAS] == 1,
+            counts))
+
+        response, counts = self.post(
+            viewer, f'/api/recipes/{recipe.id}/favorite/')
+        results.append((
+            'POST пишет и читает в основной БД',
+            response.status_code == 201 and counts[DEFAULT_DB_ALIAS]
+            and not counts[REPLICA_DB_ALIAS],
+            counts))
+
+        response, counts = self.get(viewer, f'/api/recipes/{recipe.id}/')
+        results.append((
+            'GET после записи закреплён за основной БД',
+            response.status_code == 200 and response.json()['is_favorited']
+            and not counts[REPLICA_DB_ALIAS],
+            counts))
+
+        response, counts = self.get(other, '/api/recipes/')
+        results.append((
+            'другой клиент по-прежнему читает реплику',
+            response.status_code == 200 and response.json()['count'] == 0
+            and counts[REPLICA_DB_ALIAS],
+            counts))
+
+        cache.clear()
+        response, counts = self.get(viewer, f'/api/recipes/{recipe.id}/')
+        results.append((
+            'по истечении закрепления чтение снова идёт на реплику',
+            response.status_code == 404 and counts[REPLICA_DB_ALIAS],
+            counts))
+
+        token = use_replica.set(True)
+        try:
+            outside = router.db_for_read(Recipe)
+            with transaction.atomic():
+                inside = router.db_for_read(Recipe)
+            write = router.db_for_write(Recipe)
+        finally:
+            use_replica.reset(token)
+        results.append((
+            'atomic и запись — в основной БД',
+            (outside, inside, write)
+            == (REPLICA_DB_ALIAS, DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS),
+            {'вне atomic': outside, 'в atomic': inside, 'запись': write}))
+        return results
+
+    def handle(self, *args, **options):
+        with TemporaryDirectory() as directory, \
+                sqlite_databases(directory), local_cache():
+            for alias in ALIASES:
+                call_command('migrate', database=alias, verbosity=0)
+            results = self.get_results()
+        failures = []
+        for title, passed, counts in results:
+            line = f'{title:<58} {dict(counts)}'
+            if passed:
+                self.stdout.write(line)
+            else:
+                failures.append(title)
+                self.stdout.write(self.style.ERROR(line))
+        if failures:
+            raise CommandError('Маршрутизация БД нарушена: '
+                               + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(
+            f'Маршрутизация БД в порядке ({len(results)}).'))
@@ -0,0 +1,82 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.storage import get_file_fields
+
+
+class Command(BaseCommand):
+    help = ('Removing media files not referenced by any record; with '
+            '--rehash, files stored under upload names are moved to '
+            'content-hash names first')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true',
+                            help='Переименовать файлы по хэшу '
+                                 'содержимого.')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе, с.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def is_hashed(self, name):
+        stem = os.path.splitext(os.path.basename(name))[0]
+        return len(stem) == 64 and all(c in '0123456789abcdef' for c in stem)
+
+    def rehash(self, dry_run):
+        renamed = 0
+        for model, field_names in get_file_fields().items():
+            for field_name in field_names:
+                instances = model._default_manager.exclude(
+                    **{field_name: ''}).exclude(**{field_name: None})
+                for instance in instances.only('pk', field_name).iterator():
+                    file = getattr(instance, field_name)
+                    if self.is_hashed(file.name) or not file.storage.exists(
+                            file.name):
+                        continue
+                    renamed += 1
+                    if dry_run:
+                        continue
+                    with file.open('rb'), transaction.atomic():
+                        file.name = file.storage.save(file.name, file.file)
+                        instance.save(update_fields=[field_name])
+        return renamed
+
+    def referenced(self):
+        names = set()
+        for model, field_names in get_file_fields().items():
+            for field_name in field_names:
+                names.update(model._default_manager.values_list(
+                    field_name, flat=True))
+        return names
+
+    def walk(self, directory=''):
+        if not default_storage.exists(directory):
+            return
+        directories, files = default_storage.listdir(directory)
+        for name in files:
+            yield os.path.join(directory, name)
+        for name in directories:
+            yield from self.walk(os.path.join(directory, name))
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if options['rehash']:
+            self.stdout.write(
+                f'Переименовано файлов: {self.rehash(dry_run)}.')
+        referenced = self.referenced()
+        deadline = time.time() - options['min_age']
+        removed = freed = 0
+        for name in self.walk():
+            path = default_storage.path(name)
+            if name in referenced or os.path.getmtime(path) > deadline:
+                continue
+            removed += 1
+            freed += os.path.getsize(path)
+            if not dry_run:
+                default_storage.delete_now(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет удалено" if dry_run else "Удалено"} файлов: '
+            f'{removed}, {freed / 1024 ** 2:.1f} МБ.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from recipes.deletion import RECIPE_RELATIONS, USER_RELATIONS, get_remaining
+from recipes.models import Recipe
+
+from core.models import CustomUser as User
+
+
+class Command(BaseCommand):
+    help = ('Progress of background deletions: hidden users and recipes '
+            'with the number of related rows left to delete')
+
+    def write_remaining(self, title, deleted, remaining):
+        left = ', '.join(
+            f'{model._meta.verbose_name_plural} ({field}): {count}'
+            for (model, field), count in remaining.items() if count)
+        self.stdout.write(f'{title}, скрыт {deleted:%Y-%m-%d %H:%M:%S}: '
+                          f'{left or "связей не осталось"}')
+
+    def handle(self, *args, **options):
+        users = User.all_objects.filter(deleted__isnull=False)
+        for user in users.only('id', 'username', 'deleted'):
+            remaining = get_remaining(USER_RELATIONS, user.id)
+            remaining[Recipe, 'author'] = Recipe.all_objects.filter(
+                author_id=user.id).count()
+            self.write_remaining(f'Пользователь {user.id} {user}',
+                                 user.deleted, remaining)
+        recipes = Recipe.all_objects.filter(
+            deleted__isnull=False, author__deleted__isnull=True)
+        for recipe in recipes.only('id', 'name', 'deleted'):
+            self.write_remaining(f'Рецепт {recipe.id} {recipe}',
+                                 recipe.deleted,
+                                 get_remaining(RECIPE_RELATIONS, recipe.id))
+        self.stdout.write(self.style.SUCCESS(
+            f'Ожидают удаления: пользователей {users.count()}, '
+            f'рецептов {recipes.count()}.'))
@@ -0,0 +1,51 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import (get_deleted_queryset, get_export_queryset,
+                        iter_export, parse_since)
+from core.constants import ExportLimits
+
+
+class Command(BaseCommand):
+    help = ('Streaming export of the recipe catalog to NDJSON '
+            '(gzip for .gz files); with --since, only recipes '
+            'changed since the given moment, followed by deletion marks')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since',
+                            help='Дата и время ISO 8601, например '
+                                 '2026-10-01T00:00:00+03:00.')
+        parser.add_argument('--output', default='-',
+                            help='Файл выгрузки; .gz — со сжатием, '
+                                 '- — стандартный вывод.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=ExportLimits.CHUNK_SIZE)
+
+    def open_output(self, path):
+        if path == '-':
+            return sys.stdout.buffer
+        if path.endswith('.gz'):
+            return gzip.open(path, 'wb')
+        return open(path, 'wb')
+
+    def handle(self, *args, **options):
+        try:
+            since = options['since'] and parse_since(options['since'])
+        except ValueError as error:
+            raise CommandError(error)
+        output = self.open_output(options['output'])
+        deleted = get_deleted_queryset(since) if since else None
+        exported = 0
+        try:
+            for chunk in iter_export(get_export_queryset(since),
+                                     chunk_size=options['chunk_size'],
+                                     deleted=deleted):
+                output.write(chunk)
+                exported += chunk.count(b'\n')
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено строк: {exported}.'))
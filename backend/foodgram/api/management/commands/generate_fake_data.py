@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.fake_data import INGREDIENTS_HISTOGRAM, DatasetGenerator
+
+
+def histogram(value):
+    """Гистограмма вида '3:8,4:14,5:18' (число ингредиентов: вес)."""
+    try:
+        return {
+            int(size): float(weight)
+            for size, weight in (pair.split(':') for pair in value.split(','))
+        }
+    except ValueError:
+        raise CommandError(f'Некорректная гистограмма: {value}')
+
+
+class Command(BaseCommand):
+    help = ('Generating large fake datasets (users, recipes, ingredients, '
+            'favorites, carts, subscriptions) with COPY on PostgreSQL')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', type=str, default='fake')
+        parser.add_argument('--authors-share', type=float, default=0.3)
+        parser.add_argument('--author-exponent', type=float, default=1.1,
+                            help='Показатель Ципфа популярности авторов.')
+        parser.add_argument('--recipe-exponent', type=float, default=0.9,
+                            help='Показатель Ципфа популярности рецептов.')
+        parser.add_argument('--favorites-per-user', type=float, default=20)
+        parser.add_argument('--cart-per-user', type=float, default=4)
+        parser.add_argument('--subscriptions-per-user', type=float,
+                            default=10)
+        parser.add_argument(
+            '--ingredients-histogram', type=histogram,
+            default=INGREDIENTS_HISTOGRAM,
+            help='Распределение числа ингредиентов в рецепте, '
+                 'например 3:8,4:14,5:18.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно минимум 2 пользователя и 1 рецепт.')
+        started = time.perf_counter()
+        counts = DatasetGenerator(
+            users=options['users'],
+            recipes=options['recipes'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            authors_share=options['authors_share'],
+            author_exponent=options['author_exponent'],
+            recipe_exponent=options['recipe_exponent'],
+            favorites_per_user=options['favorites_per_user'],
+            cart_per_user=options['cart_per_user'],
+            subscriptions_per_user=options['subscriptions_per_user'],
+            ingredients_histogram=options['ingredients_histogram'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        ).generate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {sum(counts.values())} '
+            f'за {time.perf_counter() - started:.1f} с.'
+        ))
@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Measuring throughput and latency of an endpoint '
+            'at increasing concurrency levels')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', type=str)
+        parser.add_argument('--concurrency', nargs='+', type=int,
+                            default=[1, 5, 10, 25, 50])
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--timeout', type=float, default=10.0)
+        parser.add_argument('--token', type=str, default=None)
+
+    def fetch(self, session, url, timeout):
+        started = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=timeout).status_code < 500
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - started
+
+    def run_level(self, url, concurrency, total, timeout, headers):
+        sessions = [requests.Session() for _ in range(concurrency)]
+        for session in sessions:
+            session.headers.update(headers)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(
+                lambda i: self.fetch(sessions[i % concurrency], url, timeout),
+                range(total)
+            ))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for ok, _ in results if not ok)
+        return {
+            'rps': total / elapsed,
+            'p50': latencies[len(latencies) // 2] * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'errors': errors,
+        }
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        self.stdout.write(
+            f'{"concurrency":>11} {"rps":>8} {"p50, ms":>9} '
+            f'{"p95, ms":>9} {"errors":>6}'
+        )
+        for concurrency in options['concurrency']:
+            stats = self.run_level(options['url'], concurrency,
+                                   options['requests'], options['timeout'],
+                                   headers)
+            self.stdout.write(
+                f'{concurrency:>11} {stats["rps"]:>8.1f} '
+                f'{stats["p50"]:>9.1f} {stats["p95"]:>9.1f} '
+                f'{stats["errors"]:>6}'
+            )
@@ -0,0 +1,162 @@
+import json
+import os
+import random
+import secrets
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.load_replay import (SCENARIOS, Collection, ReplayError, Stats,
+                             VirtualUser, prepare)
+from core.models import CustomUser as User
+
+PREFIX = 'load'
+COLLECTION = (settings.BASE_DIR.parent.parent / 'postman_collection'
+              / 'foodgram.postman_collection.json')
+SERVERS = {
+    'wsgi': ['-k', 'sync', 'foodgram.wsgi:application'],
+    'asgi': ['-k', 'uvicorn_worker.UvicornWorker',
+             'foodgram.asgi:application'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Concurrent replay of the Postman collection flows as weighted '
+            'virtual-user scenarios with per-endpoint latency, errors '
+            'and DB query totals')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=list(SERVERS),
+                            help='Запустить локальный gunicorn '
+                                 '(WSGI или ASGI) на время прогона.')
+        parser.add_argument('--url', type=str,
+                            default='http://127.0.0.1:8000',
+                            help='Адрес уже запущенного сервера.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--collection', type=str, default=COLLECTION)
+        parser.add_argument('--users', type=int, default=10,
+                            help='Число виртуальных пользователей.')
+        parser.add_argument('--duration', type=float, default=30.0)
+        parser.add_argument('--recipes', type=int, default=20,
+                            help='Рецептов, создаваемых для сценариев.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--output', type=str,
+                            help='Файл для сохранения результатов (JSON).')
+        parser.add_argument('--keep-data', action='store_true',
+                            help='Не удалять созданных пользователей.')
+
+    def start_server(self, kind, port, workers):
+        env = {
+            **os.environ,
+            'SERVER_TIMING_FOR_ALL': 'True',
+            'THROTTLE_ANON_RATE': os.getenv('THROTTLE_ANON_RATE',
+                                            '1000000/day'),
+            'THROTTLE_RECIPE_CREATE_RATE': os.getenv(
+                'THROTTLE_RECIPE_CREATE_RATE', '1000000/day'),
+        }
+        process = subprocess.Popen(
+            ['gunicorn', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers), *SERVERS[kind]],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('Сервер завершился при запуске.')
+            try:
+                requests.get(f'{url}/api/tags/', timeout=1)
+            except requests.RequestException:
+                time.sleep(0.2)
+                continue
+            return process, url
+        process.terminate()
+        raise CommandError('Сервер не запустился за 30 с.')
+
+    def run_load(self, collection, url, options, prefix):
+        shared, recipe_ids = prepare(collection, url, prefix,
+                                     options['recipes'], options['timeout'])
+        stats = Stats()
+        users = [
+            VirtualUser(collection, url, shared, prefix, number,
+                        random.Random(options['seed'] + number), stats,
+                        options['timeout'])
+            for number in range(1, options['users'] + 1)
+        ]
+        stats.started = time.monotonic()
+        deadline = stats.started + options['duration']
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            for future in [executor.submit(user.run, deadline, recipe_ids)
+                           for user in users]:
+                future.result()
+        stats.finished = time.monotonic()
+        return stats
+
+    def report(self, rows, total, statuses):
+        self.stdout.write(
+            f'{"endpoint":<62} {"reqs":>6} {"rps":>7} {"p50":>7} '
+            f'{"p95":>7} {"p99":>7} {"err%":>6} {"queries":>8} '
+            f'{"q/req":>6} {"db ms":>6}'
+        )
+        for endpoint, row in [*rows.items(), ('TOTAL', total)]:
+            line = (
+                f'{endpoint[:62]:<62} {row["requests"]:>6} {row["rps"]:>7} '
+                f'{row["p50_ms"]:>7} {row["p95_ms"]:>7} '
+                f'{row["p99_ms"]:>7} {row["error_rate"]:>6} '
+                f'{row["queries"]:>8} {row["queries_per_request"]:>6} '
+                f'{row["db_ms_per_request"]:>6}'
+            )
+            self.stdout.write(
+                self.style.ERROR(line) if row['errors'] else line)
+        self.stdout.write('Коды ответов: ' + ', '.join(
+            f'{status}: {count}'
+            for status, count in sorted(statuses.items(), key=str)))
+
+    def handle(self, *args, **options):
+        try:
+            collection = Collection(options['collection'])
+        except OSError as error:
+            raise CommandError(f'Коллекция не прочитана: {error}')
+        prefix = f'{PREFIX}-{secrets.token_hex(3)}'
+        process = None
+        url = options['url']
+        if options['server']:
+            process, url = self.start_server(
+                options['server'], options['port'], options['workers'])
+        try:
+            stats = self.run_load(collection, url, options, prefix)
+        except ReplayError as error:
+            raise CommandError(error)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+            if not options['keep_data']:
+                User.objects.filter(
+                    username__startswith=f'{prefix}-').delete()
+        rows, total = stats.summarize()
+        self.report(rows, total, stats.statuses)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'server': options['server'] or url,
+                    'users': options['users'],
+                    'duration': options['duration'],
+                    'scenarios': {name: weight for name, (weight, _)
+                                  in SCENARIOS.items()},
+                    'total': total,
+                    'endpoints': rows,
+                }, f, ensure_ascii=False, indent=2)
+        if total['queries'] == 0:
+            self.stdout.write(
+                'Число запросов к БД недоступно: включите '
+                'SERVER_TIMING_FOR_ALL на сервере.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено запросов: {total["requests"]}, '
+            f'ошибок: {total["errors"]}.'))
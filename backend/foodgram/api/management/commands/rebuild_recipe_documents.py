@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from recipes import documents
+from recipes.models import Recipe
+
+from core.constants import DocumentLimits
+
+
+class Command(BaseCommand):
+    help = ('Rebuilding denormalized recipe documents in batches, '
+            'each batch in its own transaction')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=DocumentLimits.REBUILD_BATCH_SIZE)
+        parser.add_argument('--stale', action='store_true',
+                            help='Только отсутствующие и устаревшие '
+                                 'документы.')
+        parser.add_argument('--author', type=int,
+                            help='Только рецепты автора с этим id.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('id')
+        if options['stale']:
+            recipes = recipes.filter(
+                Q(document__isnull=True)
+                | ~Q(document__version=documents.DOCUMENT_VERSION))
+        if options['author']:
+            recipes = recipes.filter(author_id=options['author'])
+        ids = list(recipes.values_list('id', flat=True))
+        started = time.perf_counter()
+        batch_size = options['batch_size']
+        for offset in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                documents.rebuild(ids[offset:offset + batch_size],
+                                  batch_size)
+            if self.stdout.isatty():
+                done = min(offset + batch_size, len(ids))
+                self.stdout.write(f'{done} / {len(ids)}', ending='\r')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано документов: {len(ids)} '
+            f'за {time.perf_counter() - started:.1f} с.'))
@@ -0,0 +1,70 @@
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from prometheus_client import start_http_server
+
+from core import tasks
+from core.metrics import get_registry
+
+
+class Command(BaseCommand):
+    help = ('Running background task workers: processes with thread pools '
+            'taking tasks from the database queue')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--metrics-port', type=int,
+                            help='Порт HTTP-сервера метрик Prometheus.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Завершиться, когда готовых задач '
+                                 'не останется.')
+
+    def run_threads(self, threads, burst):
+        with ThreadPoolExecutor(threads,
+                                thread_name_prefix='worker') as executor:
+            for _ in range(threads):
+                executor.submit(tasks.work, self.stop, burst)
+
+    def run_child(self, threads, burst):
+        self.children = []
+        self.run_threads(threads, burst)
+
+    def shutdown(self, signum, frame):
+        """Потоки дорабатывают текущие задачи и завершаются."""
+        self.stop.set()
+        for child in self.children:
+            if child.is_alive():
+                os.kill(child.pid, signum)
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.children = []
+        signal.signal(signal.SIGTERM, self.shutdown)
+        signal.signal(signal.SIGINT, self.shutdown)
+        tasks.schedule_periodic()
+        if options['metrics_port']:
+            start_http_server(options['metrics_port'],
+                              registry=get_registry())
+        self.stdout.write(
+            f'Воркер запущен: процессов {options["processes"]}, '
+            f'потоков {options["threads"]}.')
+        thread_args = (options['threads'], options['burst'])
+        if options['processes'] == 1:
+            self.run_threads(*thread_args)
+        else:
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            for _ in range(options['processes']):
+                child = context.Process(
+                    target=self.run_child, args=thread_args)
+                child.start()
+                self.children.append(child)
+            for child in self.children:
+                child.join()
+        self.stdout.write(self.style.SUCCESS('Воркер остановлен.'))
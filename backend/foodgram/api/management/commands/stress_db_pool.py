@@ -0,0 +1,86 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.db.pool import get_pool_stats
+
+SERVER_CONNECTIONS_SQL = (
+    'SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()'
+)
+
+
+class Command(BaseCommand):
+    help = ('Stress test of database connections: many threads run '
+            'short requests while server connection count is sampled')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--query-seconds', type=float, default=0.01)
+        parser.add_argument('--sample-interval', type=float, default=0.5)
+
+    def simulate_requests(self, iterations, query_seconds, errors):
+        for _ in range(iterations):
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_sleep(%s)', [query_seconds])
+            except Exception as error:
+                errors.append(error)
+            finally:
+                # Конец «запроса»: соединение возвращается в пул.
+                connection.close()
+
+    def sample(self, stop, interval):
+        while not stop.wait(interval):
+            with connection.cursor() as cursor:
+                cursor.execute(SERVER_CONNECTIONS_SQL)
+                server_connections = cursor.fetchone()[0]
+            connection.close()
+            stats = get_pool_stats().get('default', {})
+            self.stdout.write(
+                f'{time.strftime("%H:%M:%S")} '
+                f'server={server_connections:<4} '
+                f'pool={stats.get("size", "-")}/{stats.get("max_size", "-")} '
+                f'waiting={stats.get("waiting", "-")} '
+                f'timeouts={stats.get("timeouts", "-")}'
+            )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Нагрузочный тест требует PostgreSQL.')
+        errors = []
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self.sample, args=(stop, options['sample_interval']))
+        sampler.start()
+        workers = [
+            threading.Thread(
+                target=self.simulate_requests,
+                args=(options['iterations'], options['query_seconds'], errors)
+            )
+            for _ in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        sampler.join()
+        connections.close_all()
+        total = options['threads'] * options['iterations']
+        self.stdout.write(
+            f'Запросов: {total}, ошибок: {len(errors)}, '
+            f'{total / elapsed:.1f} запросов/с'
+        )
+        for alias, stats in get_pool_stats().items():
+            average = (stats['acquire_seconds_total']
+                       / max(stats['acquired'], 1) * 1000)
+            self.stdout.write(self.style.SUCCESS(
+                f'{alias}: создано соединений {stats["created"]}, '
+                f'среднее ожидание {average:.2f} мс, '
+                f'максимум {stats["acquire_seconds_max"] * 1000:.2f} мс'
+            ))
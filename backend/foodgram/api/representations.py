@@ -0,0 +1,143 @@
+"""
+Представление рецептов для чтения без сериализаторов DRF и моделей:
+денормализованные документы рецептов и отметки пользователя
+из кэша его отношений. Результат совпадает с RecipeSerializer,
+в том числе при частичном выводе полей (api.fieldsets).
+"""
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from recipes import relations
+from recipes.documents import build_documents, enqueue_stale, is_current
+
+from .fieldsets import ALL_FIELDS
+
+RECIPE_VALUES = ('id', 'author_id', 'document')
+# Поля рецепта, которых нет в колонках таблицы, только в документе.
+DOCUMENT_FIELDS = ('tags', 'author', 'ingredients', 'text')
+COLUMN_FIELDS = ('name', 'image', 'cooking_time')
+VIEWER_FIELDS = ('is_favorited', 'is_in_shopping_cart', 'author.is_subscribed')
+
+
+def get_recipe_values(fieldset=ALL_FIELDS):
+    """Колонки values(): документ читается, только если нужны его поля."""
+    if any(name in fieldset for name in DOCUMENT_FIELDS):
+        return RECIPE_VALUES
+    return ('id', *(name for name in COLUMN_FIELDS if name in fieldset))
+
+
+def needs_viewer(fieldset):
+    """Нужны ли в ответе отметки пользователя."""
+    return any(fieldset.includes(path) for path in VIEWER_FIELDS)
+
+
+def media_url(request, file_name):
+    """Абсолютный адрес файла, как у ImageField сериализатора."""
+    if not file_name:
+        return None
+    url = default_storage.url(file_name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def is_stale(row):
+    return 'document' in row and not is_current(row['document'])
+
+
+def fill_documents(rows):
+    """
+    Документы, которые ещё не собраны или устарели, собираются на лету
+    и ставятся в очередь на сохранение.
+    """
+    stale = [row['id'] for row in rows if is_stale(row)]
+    if stale:
+        documents = build_documents(stale)
+        for row in rows:
+            if row['id'] in documents:
+                row['document'] = documents[row['id']]
+        enqueue_stale(list(documents))
+    return rows
+
+
+async def afill_documents(rows):
+    if not any(is_stale(row) for row in rows):
+        return rows
+    return await sync_to_async(fill_documents)(rows)
+
+
+def get_viewer(request, fieldset=ALL_FIELDS):
+    if not needs_viewer(fieldset):
+        return relations.Relations.empty()
+    return relations.for_request(request)
+
+
+async def aget_relations(user, fieldset=ALL_FIELDS):
+    if not user.is_authenticated or not needs_viewer(fieldset):
+        return relations.Relations.empty()
+    return await sync_to_async(relations.get_relations)(user)
+
+
+def build_recipe(request, row, viewer):
+    """
+    Рецепт в формате RecipeSerializer из документа
+    и отношений пользователя.
+    """
+    document = row['document']
+    author_id, first_name, last_name, username, email, avatar = document[
+        'author']
+    return {
+        'id': row['id'],
+        'tags': [{'id': tag_id, 'name': name, 'slug': slug}
+                 for tag_id, name, slug in document['tags']],
+        'author': {
+            'id': author_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'username': username,
+            'email': email,
+            'is_subscribed': viewer.has(relations.SUBSCRIPTIONS, author_id),
+            'avatar': media_url(request, avatar),
+        },
+        'ingredients': [
+            {'id': ingredient_id, 'name': name, 'amount': amount,
+             'measurement_unit': unit}
+            for ingredient_id, name, amount, unit in document['ingredients']
+        ],
+        'is_favorited': viewer.has(relations.FAVORITES, row['id']),
+        'is_in_shopping_cart': viewer.has(relations.CART, row['id']),
+        'name': document['name'],
+        'image': media_url(request, document['image']),
+        'text': document['text'],
+        'cooking_time': document['cooking_time'],
+    }
+
+
+def build_column_recipe(request, row, viewer):
+    """Рецепт из колонок строки, когда документ не читался."""
+    recipe = {
+        'id': row['id'],
+        'is_favorited': viewer.has(relations.FAVORITES, row['id']),
+        'is_in_shopping_cart': viewer.has(relations.CART, row['id']),
+    }
+    for name in COLUMN_FIELDS:
+        if name in row:
+            recipe[name] = row[name]
+    if 'image' in recipe:
+        recipe['image'] = media_url(request, recipe['image'])
+    return recipe
+
+
+def build_recipes(request, rows, viewer, fieldset=ALL_FIELDS):
+    """Рецепты из строк get_recipe_values() с полями из fieldset."""
+    recipes = [
+        build_recipe(request, row, viewer) if 'document' in row
+        else build_column_recipe(request, row, viewer)
+        for row in rows
+    ]
+    if fieldset.is_full:
+        return recipes
+    return [fieldset.prune(recipe) for recipe in recipes]
+
+
+def represent_recipes(request, rows, fieldset=ALL_FIELDS):
+    rows = fill_documents(list(rows))
+    return build_recipes(
+        request, rows, get_viewer(request, fieldset), fieldset)
@@ -1,13 +1,18 @@
 from django.db import transaction
 from djoser.serializers import UserCreateSerializer
-from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredients,
-                            ShoppingCart, Subscribe, Tag)
+from recipes import documents, relations, timeline
+from recipes.models import (Ingredient, Recipe, RecipeIngredients, Subscribe,
+                            Tag)
+from recipes.tasks import create_short_link
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
 from .fields import Base64ImageField
+from .fieldsets import FieldsetSerializerMixin
+from core.constants import BulkLimits
 from core.models import CustomUser as User
+from core.tasks import enqueue
 
 
 class CreateUserSerializer(UserCreateSerializer):
@@ -18,7 +23,8 @@ class CreateUserSerializer(UserCreateSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def validate(self, attrs):
-        if User.objects.filter(username=attrs.get('username')).exists():
+        if User.all_objects.filter(
+                username=attrs.get('username')).exists():
             raise ValidationError("Имя пользователя занято.")
         return super().validate(attrs)
 
@@ -32,7 +38,8 @@ class CreateUserSerializer(UserCreateSerializer):
         }
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(FieldsetSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор получения (просмотра) профиля пользователя."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -49,10 +56,15 @@ class CustomUserSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        """Проверка наличия подписки на просматриваемого пользователя"""
-        user = self.context['request'].user
-        return False if user.is_anonymous else user.subscriber.filter(
-            author=obj).exists() and user.is_authenticated
+        """
+        Проверка наличия подписки на просматриваемого пользователя;
+        в аннотированных запросах берётся значение аннотации is_subscribed,
+        иначе — кэш отношений пользователя.
+        """
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return relations.for_request(self.context['request']).has(
+            relations.SUBSCRIPTIONS, obj.id)
 
 
 class CustomUserAvatarSerializer(CustomUserSerializer):
@@ -71,14 +83,15 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор тэгов."""
     class Meta:
         model = Tag
         fields = '__all__'
 
 
-class RecipeIngredientsSerializer(serializers.ModelSerializer):
+class RecipeIngredientsSerializer(FieldsetSerializerMixin,
+                                  serializers.ModelSerializer):
     """
     Сериализатор для связной модели RecipeIngredients,
     списка ингредиентов для рецепта.
@@ -93,7 +106,7 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'amount', 'measurement_unit']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор рецептов."""
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField(required=False, allow_null=True)
@@ -119,18 +132,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user.id
-        recipe = obj.id
-        return Favorites.objects.filter(
-            user_id=user,
-            recipe_id=recipe).exists()
+        return relations.for_request(self.context['request']).has(
+            relations.FAVORITES, obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user.id
-        recipe = obj.id
-        return ShoppingCart.objects.filter(
-            user_id=user,
-            recipe_id=recipe).exists()
+        return relations.for_request(self.context['request']).has(
+            relations.CART, obj.id)
 
     def create_ingredients_list(self, ingredients, recipe):
         """Создание списка ингредиентов для рецепта."""
@@ -149,11 +156,16 @@ class RecipeSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         ingredients = self.context['request'].data.get('ingredients', [])
         tags = self.context['request'].data.get('tags', [])
-        recipe = Recipe.objects.create(
-            author=self.context['request'].user, **validated_data
-        )
-        self.create_ingredients_list(ingredients, recipe)
-        recipe.tags.set(tags)
+        with documents.deferred():
+            author = self.context['request'].user
+            recipe = Recipe.objects.create(
+                author=author, pulled=timeline.is_celebrity(author.id),
+                **validated_data
+            )
+            self.create_ingredients_list(ingredients, recipe)
+            recipe.tags.set(tags)
+        timeline.publish(recipe)
+        enqueue(create_short_link, recipe.id)
         return recipe
 
     @transaction.atomic
@@ -165,28 +177,27 @@ class RecipeSerializer(serializers.ModelSerializer):
         if image:
             instance.image = image
 
-        instance = super().update(instance, validated_data)
-        instance.tags.set(tags)
-        instance.recipeingredients.all().delete()
-        self.create_ingredients_list(ingredients, instance)
+        with documents.deferred():
+            instance = super().update(instance, validated_data)
+            instance.tags.set(tags)
+            instance.recipeingredients.all().delete()
+            self.create_ingredients_list(ingredients, instance)
         return instance
 
     def to_representation(self, instance):
+        fieldset = self.fieldset
+        if hasattr(instance, 'author_is_subscribed') and fieldset.includes(
+                'author.is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
         representation = super().to_representation(instance)
 
-        ingredients = instance.recipeingredients.all()
-        ingredients_representation = RecipeIngredientsSerializer(
-            ingredients, many=True
-        ).data
-        representation['ingredients'] = ingredients_representation
-
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            author = instance.author
-            is_subscribed = Subscribe.objects.filter(
-                user=request.user, author=author
-            ).exists()
-            representation['author']['is_subscribed'] = is_subscribed
+        if 'ingredients' in fieldset:
+            ingredients = instance.recipeingredients.all()
+            ingredients_representation = RecipeIngredientsSerializer(
+                ingredients, many=True,
+                context={'fieldset': fieldset.nested('ingredients')}
+            ).data
+            representation['ingredients'] = ingredients_representation
 
         return representation
 
@@ -204,15 +215,22 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise ValidationError('Необходимо добавить хотя '
                                   'бы один ингредиент.')
 
+        existing_tags = {str(tag_id) for tag_id in Tag.objects.filter(
+            id__in=tags).values_list('id', flat=True)}
         checked_tags = set()
         for tag in tags:
             if tag in checked_tags:
                 raise ValidationError('Нельзя использовать повторяющиеся '
                                       'тэги .')
-            if not Tag.objects.filter(id=tag).exists():
+            if str(tag) not in existing_tags:
                 raise ValidationError(f'Указан несуществующий тэг - {tag}.')
             checked_tags.add(tag)
 
+        existing_ingredients = {
+            str(ingredient_id) for ingredient_id in Ingredient.objects.filter(
+                id__in=[ingredient['id'] for ingredient in ingredients]
+            ).values_list('id', flat=True)
+        }
         checked_ingredients = set()
         for ingredient in ingredients:
             if int(ingredient['amount']) < 1:
@@ -220,7 +238,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             if ingredient['id'] in checked_ingredients:
                 raise ValidationError('Нельзя использовать два '
                                       'одинаковых ингредиента.')
-            if not Ingredient.objects.filter(id=ingredient['id']).exists():
+            if str(ingredient['id']) not in existing_ingredients:
                 raise ValidationError(f'Указан несуществующий ингредиент '
                                       f'- {ingredient}.')
             checked_ingredients.add(ingredient['id'])
@@ -228,7 +246,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         return data
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ShortRecipeSerializer(FieldsetSerializerMixin,
+                            serializers.ModelSerializer):
     """Сериализатор для вывода сокращенной информации о рецепте."""
 
     class Meta:
@@ -236,21 +255,8 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'image', 'cooking_time']
 
 
-class FavoritesSerializer(serializers.ModelSerializer):
-    """Сериализатор для списка 'Избранное'."""
-    class Meta:
-        model = Favorites
-        fields = ['user', 'recipe']
-
-    def to_representation(self, instance):
-        """Представление данных для формата JSON в списке 'Избранное'."""
-        return ShortRecipeSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
-
-
-class SubscriptionsSerialiazer(serializers.ModelSerializer):
+class SubscriptionsSerialiazer(FieldsetSerializerMixin,
+                               serializers.ModelSerializer):
     """Сериализатор для списка подписок."""
     recipes = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.SerializerMethodField(read_only=True)
@@ -271,23 +277,30 @@ class SubscriptionsSerialiazer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверка наличия подписки на просматриваемого пользователя"""
-        user = self.context['request'].user
-        return user.subscriber.filter(
-            author=obj
-        ).exists() if user.is_authenticated else False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return relations.for_request(self.context['request']).has(
+            relations.SUBSCRIPTIONS, obj.id)
 
     def get_recipes_count(self, obj):
         """Подсчитывает кол-во рецептов для 'recipes_limit'."""
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj).count()
 
     def get_recipes(self, obj):
         """Добавляет в выдачу подписок рецепты избранных авторов."""
-        request = self.context.get('request')
-        recipes = Recipe.objects.filter(author=obj)
-        recipes_limit = request.GET.get('recipes_limit')
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
-        serializer = ShortRecipeSerializer(recipes, many=True)
+        if hasattr(obj, 'page_recipes'):
+            recipes = obj.page_recipes
+        else:
+            request = self.context.get('request')
+            recipes = Recipe.objects.filter(author=obj)
+            recipes_limit = request.GET.get('recipes_limit')
+            if recipes_limit:
+                recipes = recipes[:int(recipes_limit)]
+        serializer = ShortRecipeSerializer(
+            recipes, many=True,
+            context={'fieldset': self.fieldset.nested('recipes')})
         return serializer.data
 
 
@@ -320,21 +333,15 @@ class SubscribeSerialiazer(serializers.ModelSerializer):
         ).data
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для сохранения рецепта в список покупок."""
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-        validators = (
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=('user', 'recipe')
-            ),
-        )
+class BulkIdsSerializer(serializers.Serializer):
+    """Сериализатор списка идентификаторов для пакетных действий."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(
+            min_value=1, max_value=BulkLimits.MAX_ID),
+        allow_empty=False,
+        max_length=BulkLimits.MAX_IDS,
+    )
 
-    def to_representation(self, instance):
-        """Представление данных для формата JSON в списке покупок."""
-        return ShortRecipeSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
+    def validate_ids(self, ids):
+        """Повторы отбрасываются, порядок сохраняется."""
+        return list(dict.fromkeys(ids))
@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CustomUserViewSet, download_shopping_cart,
-                    GetShortLinkView, IngredientViewSet,
-                    RecipeViewSet, RedirectShortLinkView,
+from . import async_views
+from .views import (CustomUserViewSet, db_pool_stats, DjoserUserViewSet,
+                    download_shopping_cart, GetShortLinkView,
+                    IngredientViewSet, RecipeViewSet, RedirectShortLinkView,
                     TagViewSet)
 
 app_name = 'api'
@@ -13,6 +15,46 @@ router.register('users', CustomUserViewSet, basename='users')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
+router.register('users', DjoserUserViewSet, basename='customuser')
+
+async_urlpatterns = [
+    path('s/<str:short_hash>/',
+         async_views.redirect_short_link,
+         name='redirect_short_link',),
+    path('tags/',
+         async_views.async_read_view(
+             async_views.tag_list,
+             TagViewSet.as_view({'get': 'list'})),
+         name='tags-list'),
+    path('tags/<int:pk>/',
+         async_views.async_read_view(
+             async_views.tag_detail,
+             TagViewSet.as_view({'get': 'retrieve'})),
+         name='tags-detail'),
+    path('ingredients/',
+         async_views.async_read_view(
+             async_views.ingredient_list,
+             IngredientViewSet.as_view({'get': 'list'})),
+         name='ingredients-list'),
+    path('ingredients/<int:pk>/',
+         async_views.async_read_view(
+             async_views.ingredient_detail,
+             IngredientViewSet.as_view({'get': 'retrieve'})),
+         name='ingredients-detail'),
+    path('recipes/',
+         async_views.async_read_view(
+             async_views.recipe_list,
+             RecipeViewSet.as_view({'get': 'list', 'post': 'create'})),
+         name='recipes-list'),
+    path('recipes/<int:pk>/',
+         async_views.async_read_view(
+             async_views.recipe_detail,
+             RecipeViewSet.as_view({'get': 'retrieve',
+                                    'put': 'update',
+                                    'patch': 'partial_update',
+                                    'delete': 'destroy'})),
+         name='recipes-detail'),
+]
 
 urlpatterns = [
     path("recipes/download_shopping_cart/",
@@ -24,7 +66,10 @@ urlpatterns = [
     path('recipes/<int:pk>/get-link/',
          GetShortLinkView.as_view(),
          name="get_link",),
+    path('internal/db-pool/', db_pool_stats, name='db_pool_stats'),
     path('', include(router.urls)),
-    path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.ASYNC_READ_PATH:
+    urlpatterns = urlpatterns[:1] + async_urlpatterns + urlpatterns[1:]
@@ -1,26 +1,143 @@
 from django.conf import settings
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
+from django.utils.decorators import method_decorator
 from django.views import View
-from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredients,
-                            RecipeShortLink, ShoppingCart, Subscribe, Tag)
+from django.views.decorators.gzip import gzip_page
+from djoser.views import UserViewSet
+from recipes import deletion, relations, timeline, toggles
+from recipes.models import (Favorites, Ingredient, Recipe, RecipeShortLink,
+                            ShoppingCart, Subscribe, Tag)
 from rest_framework import status, views, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator
 
-from .serializers import (CustomUserAvatarSerializer, CustomUserSerializer,
-                          FavoritesSerializer, IngredientSerializer,
-                          RecipeSerializer, ShoppingCartSerializer,
-                          SubscribeSerialiazer, SubscriptionsSerialiazer,
-                          TagSerializer)
+from .annotations import is_subscribed
+from .export import (export_response, get_deleted_queryset,
+                     get_export_queryset, parse_since)
+from .fieldsets import Fieldset
+from .representations import (fill_documents, get_recipe_values,
+                              represent_recipes)
+from .serializers import (BulkIdsSerializer, CustomUserAvatarSerializer,
+                          CustomUserSerializer, IngredientSerializer,
+                          RecipeSerializer,
+                          ShortRecipeSerializer, SubscribeSerialiazer,
+                          SubscriptionsSerialiazer, TagSerializer)
+from core.db.pool import get_pool_stats
 from core.filtres import IngredientNameFilter, RecipeFilter
+from core.metrics import render_metrics
 from core.models import CustomUser as User
-from core.pagination import PageSizePagination
+from core.pagination import (KeysetPagination, PageSizePagination,
+                             PopularityPagination)
 from core.permissions import IsAuthorOrReadOnly
+from core.renderers import ORJSONRenderer
+from core.tasks import update_queue_metrics
+
+
+SHORT_RECIPE_FIELDS = ('id', 'name', 'image', 'cooking_time')
+SUBSCRIPTION_AUTHOR_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar')
+RECIPES_COUNT = Count('recipes', filter=Q(recipes__deleted__isnull=True))
+
+
+def filter_by_pk(queryset, pk):
+    """Фильтр по первичному ключу из URL; нечисловой ключ — 404."""
+    try:
+        return queryset.filter(pk=int(pk))
+    except ValueError:
+        raise Http404
+
+
+def attach_recipes(authors, limit=None):
+    """
+    Рецепты авторов страницы подписок одним запросом: не больше limit
+    последних на автора, в атрибуте page_recipes.
+    """
+    recipes = Recipe.objects.filter(
+        author_id__in=[author.id for author in authors]
+    ).only(*SHORT_RECIPE_FIELDS, 'author_id')
+    if limit is not None:
+        recipes = recipes.annotate(
+            rank=Window(RowNumber(), partition_by='author_id',
+                        order_by=F('pub_date').desc())
+        ).filter(rank__lte=limit)
+    by_author = {author.id: [] for author in authors}
+    for recipe in recipes:
+        by_author[recipe.author_id].append(recipe)
+    for author in authors:
+        author.page_recipes = by_author[author.id]
+
+
+def object_not_found(model):
+    return Http404(f'No {model._meta.object_name} matches the given query.')
+
+
+def unique_together_message(*field_names):
+    return UniqueTogetherValidator.message.format(
+        field_names=', '.join(field_names))
+
+
+def unique_together_error(*field_names):
+    """Ошибка повторной связи, как у UniqueTogetherValidator."""
+    return ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+        unique_together_message(*field_names)
+    ]}, code='unique')
+
+
+def bulk_toggle(request, model, target_field, targets, rejected=None):
+    """
+    Пакетное добавление (POST) или удаление (DELETE) связей пользователя
+    с целями из списка ids одним запросом к таблице связей. rejected —
+    заранее отклонённые идентификаторы с текстом ошибки. Возвращает
+    изменённые идентификаторы и ответ с результатом по каждой цели.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    rejected = rejected or {}
+    targets = targets.filter(
+        id__in=[target_id for target_id in ids if target_id not in rejected]
+    ).values('id')
+    if request.method == 'POST':
+        changed = {
+            row['id']: created for row, created in toggles.add_many(
+                model, request.user.id, target_field, targets)
+        }
+        success = status.HTTP_201_CREATED
+        repeated = unique_together_message('user', target_field)
+    else:
+        changed = dict(toggles.remove_many(
+            model, request.user.id, target_field, targets))
+        success = status.HTTP_204_NO_CONTENT
+        repeated = None
+    not_found = str(object_not_found(targets.model))
+    results = []
+    for target_id in ids:
+        if target_id in rejected:
+            result = (status.HTTP_400_BAD_REQUEST, rejected[target_id])
+        elif target_id not in changed:
+            result = (status.HTTP_404_NOT_FOUND, not_found)
+        elif changed[target_id]:
+            result = (success, None)
+        else:
+            result = (status.HTTP_400_BAD_REQUEST, repeated)
+        item = {'id': target_id, 'status': result[0]}
+        if result[1] is not None:
+            item['detail'] = result[1]
+        results.append(item)
+    changed_ids = [target_id for target_id in ids if changed.get(target_id)]
+    return changed_ids, Response({'results': results})
 
 
 class CustomUserViewSet(viewsets.GenericViewSet):
@@ -29,6 +146,7 @@ class CustomUserViewSet(viewsets.GenericViewSet):
     permission_classes = [AllowAny]
     serializer_class = CustomUserSerializer
     pagination_class = PageSizePagination
+    throttle_scopes = {'avatar': 'upload'}
 
     @action(
         detail=True,
@@ -59,7 +177,8 @@ class CustomUserViewSet(viewsets.GenericViewSet):
                     partial=True,
                 )
                 serializer.is_valid(raise_exception=True)
-                serializer.save()
+                with transaction.atomic():
+                    serializer.save()
                 return Response(serializer.data)
             else:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -77,26 +196,61 @@ class CustomUserViewSet(viewsets.GenericViewSet):
     def subscribe(self, request, pk=None):
         """Управление подпиской на автора рецептов."""
         user = request.user
-        author = get_object_or_404(User, id=pk)
-        subscribe = Subscribe.objects.filter(
-            user=user.id,
-            author=author.id
-        )
+        authors = filter_by_pk(User.objects.all(), pk)
         if request.method == 'POST':
-            serializer = SubscribeSerialiazer(
-                data={
-                    'user': user.id,
-                    'author': author.id
-                }, context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            if int(pk) == user.id:
+                raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Нельзя подписаться на самого себя!']})
+            author, created = toggles.add(
+                Subscribe, user.id, 'author',
+                authors.annotate(recipes_count=RECIPES_COUNT).values(
+                    *SUBSCRIPTION_AUTHOR_FIELDS, 'recipes_count'))
+            if author is None:
+                raise object_not_found(User)
+            if not created:
+                raise unique_together_error('user', 'author')
+            timeline.backfill(user, author['id'])
+            relations.add(user.id, relations.SUBSCRIPTIONS, author['id'])
+            recipes_count = author.pop('recipes_count')
+            author = User(**author)
+            author.recipes_count = recipes_count
+            author.is_subscribed = True
+            serializer = SubscriptionsSerialiazer(
+                author, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if subscribe.exists():
-            subscribe.delete()
+        found, deleted = toggles.remove(
+            Subscribe, user.id, 'author', authors.values('id'))
+        if not found:
+            raise object_not_found(User)
+        if deleted:
+            timeline.prune(user, int(pk))
+            relations.remove(user.id, relations.SUBSCRIPTIONS, int(pk))
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=[IsAuthenticated],
+        url_path='subscribe/bulk',
+        url_name='subscribe-bulk',
+    )
+    def subscribe_bulk(self, request):
+        """Подписка на список авторов и отписка от них."""
+        user = request.user
+        rejected = {}
+        if request.method == 'POST':
+            rejected[user.id] = 'Нельзя подписаться на самого себя!'
+        changed, response = bulk_toggle(
+            request, Subscribe, 'author', User.objects.all(), rejected)
+        if changed and request.method == 'POST':
+            timeline.backfill(user, *changed)
+            relations.add(user.id, relations.SUBSCRIPTIONS, *changed)
+        elif changed:
+            timeline.prune(user, *changed)
+            relations.remove(user.id, relations.SUBSCRIPTIONS, *changed)
+        return response
+
     @action(
         detail=False,
         methods=['GET'],
@@ -105,14 +259,67 @@ class CustomUserViewSet(viewsets.GenericViewSet):
     )
     def subscriptions(self, request):
         """Получение списка подписок."""
-        queryset = User.objects.filter(subscriptions__user=request.user)
+        fieldset = Fieldset.from_request(request)
+        annotations = {
+            'is_subscribed': is_subscribed(request.user),
+            'recipes_count': RECIPES_COUNT,
+        }
+        queryset = User.objects.filter(
+            subscriptions__user=request.user
+        ).annotate(**{
+            name: annotation for name, annotation in annotations.items()
+            if name in fieldset
+        }).order_by(*User._meta.ordering)
         pagination = self.paginate_queryset(queryset)
+        if 'recipes' in fieldset:
+            recipes_limit = request.GET.get('recipes_limit')
+            attach_recipes(pagination,
+                           int(recipes_limit) if recipes_limit else None)
         serializer = SubscriptionsSerialiazer(
             pagination, many=True,
             context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        pagination_class=KeysetPagination
+    )
+    def feed(self, request):
+        """
+        Лента новых рецептов авторов из подписок: строки values()
+        с документами рецептов, как в списке рецептов.
+        """
+        fieldset = Fieldset.from_request(request)
+        queryset = timeline.get_feed_queryset(request.user).values(
+            *get_recipe_values(fieldset), KeysetPagination.key_field)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            represent_recipes(request, page, fieldset))
+
+
+class DjoserUserViewSet(UserViewSet):
+    """Пользователи djoser с отметкой подписки из аннотации запроса."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if 'is_subscribed' not in Fieldset.from_request(self.request):
+            return queryset
+        return queryset.annotate(
+            is_subscribed=is_subscribed(self.request.user))
+
+    def get_instance(self):
+        """Собственный профиль: подписка на себя запрещена."""
+        user = super().get_instance()
+        user.is_subscribed = False
+        return user
+
+    def perform_destroy(self, instance):
+        """Скрытие пользователя; данные удаляются в фоне."""
+        deletion.hide_users(User.objects.filter(id=instance.id))
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тэгов."""
@@ -136,6 +343,108 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = PageSizePagination
     filterset_class = RecipeFilter
     permission_classes = [IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+    throttle_scopes = {
+        'create': 'recipe_create',
+        'update': 'upload',
+        'partial_update': 'upload',
+        'export': 'export',
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not Fieldset.from_request(self.request).includes(
+                'author.is_subscribed'):
+            return queryset
+        return queryset.annotate(
+            author_is_subscribed=is_subscribed(self.request.user, 'author'))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов из строк values() без сериализатора;
+        популярные рецепты выводятся по курсору рейтинга.
+        """
+        if RecipeFilter.is_popular(request):
+            self.pagination_class = PopularityPagination
+        fieldset = Fieldset.from_request(request)
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *get_recipe_values(fieldset))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(represent_recipes(request, queryset, fieldset))
+        return self.get_paginated_response(
+            represent_recipes(request, page, fieldset))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Рецепт из строки values() без сериализатора. Проверка
+        прав на объект не нужна: чтение разрешено всем.
+        """
+        fieldset = Fieldset.from_request(request)
+        row = get_object_or_404(
+            self.filter_queryset(self.get_queryset()).values(
+                *get_recipe_values(fieldset)),
+            pk=kwargs[self.lookup_field])
+        return Response(represent_recipes(request, [row], fieldset)[0])
+
+    def represent_written(self, recipe):
+        """Рецепт после записи — из его документа, как в retrieve."""
+        fieldset = Fieldset.from_request(self.request)
+        row = Recipe.objects.filter(pk=recipe.pk).values(
+            *get_recipe_values(fieldset)).get()
+        return represent_recipes(self.request, [row], fieldset)[0]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(self.represent_written(serializer.instance),
+                        status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            self.get_object(), data=request.data,
+            partial=kwargs.pop('partial', False))
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response(self.represent_written(serializer.instance))
+
+    def perform_destroy(self, instance):
+        """Скрытие рецепта; связанные строки удаляются в фоне."""
+        deletion.hide_recipes(Recipe.objects.filter(id=instance.id))
+
+    def toggle_recipe(self, request, pk, model, kind):
+        """Добавление рецепта в список пользователя и удаление из него."""
+        user = request.user
+        recipes = filter_by_pk(Recipe.objects.all(), pk)
+        if request.method == 'POST':
+            recipe, created = toggles.add(
+                model, user.id, 'recipe', recipes.values(*SHORT_RECIPE_FIELDS))
+            if recipe is None:
+                raise object_not_found(Recipe)
+            if not created:
+                raise unique_together_error('user', 'recipe')
+            relations.add(user.id, kind, recipe['id'])
+            serializer = ShortRecipeSerializer(Recipe(**recipe))
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        found, deleted = toggles.remove(
+            model, user.id, 'recipe', recipes.values('id'))
+        if not found:
+            raise object_not_found(Recipe)
+        if deleted:
+            relations.remove(user.id, kind, int(pk))
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    def toggle_recipes(self, request, model, kind):
+        """Пакетное изменение списка рецептов пользователя."""
+        changed, response = bulk_toggle(
+            request, model, 'recipe', Recipe.objects.all())
+        if request.method == 'POST':
+            relations.add(request.user.id, kind, *changed)
+        else:
+            relations.remove(request.user.id, kind, *changed)
+        return response
 
     @action(
         detail=True,
@@ -144,23 +453,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk=None):
         """Управление списком покупок."""
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        shopping_cart = ShoppingCart.objects.filter(
-            user=user.id,
-            recipe=recipe
-        )
-        if request.method == 'POST':
-            serializer = ShoppingCartSerializer(
-                data={'user': user.id, 'recipe': recipe.id}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if shopping_cart.exists():
-            shopping_cart.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return self.toggle_recipe(request, pk, ShoppingCart, relations.CART)
 
     @action(
         detail=True,
@@ -169,43 +462,68 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, pk=None):
         """Управление списком избранного."""
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        favorites = Favorites.objects.filter(
-            user=user.id,
-            recipe=recipe
-        )
-        if request.method == 'POST':
-            serializer = FavoritesSerializer(
-                data={'user': user.id, 'recipe': recipe.id}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if favorites.exists():
-            favorites.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        return self.toggle_recipe(
+            request, pk, Favorites, relations.FAVORITES)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart/bulk',
+        url_name='shopping-cart-bulk',
+    )
+    def shopping_cart_bulk(self, request):
+        """Пакетное изменение списка покупок."""
+        return self.toggle_recipes(request, ShoppingCart, relations.CART)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite/bulk',
+        url_name='favorite-bulk',
+    )
+    def favorite_bulk(self, request):
+        """Пакетное изменение списка избранного."""
+        return self.toggle_recipes(request, Favorites, relations.FAVORITES)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+    )
+    @method_decorator(gzip_page)
+    def export(self, request):
+        """
+        Потоковая выгрузка каталога в NDJSON (со сжатием gzip, если
+        клиент его принимает); since — рецепты, изменённые с этого момента,
+        и отметки удалённых.
+        """
+        since = request.query_params.get('since')
+        try:
+            since = parse_since(since) if since else None
+        except ValueError as error:
+            raise ValidationError({'since': [str(error)]})
+        return export_response(
+            request._request, get_export_queryset(since),
+            get_deleted_queryset(since) if since else None)
 
 
 @permission_classes(IsAuthenticated)
 @api_view(['GET'])
 def download_shopping_cart(request):
-    """Скачивание корзины покупок."""
-    user = request.user
-    list_recipes = (
-        RecipeIngredients.objects.filter(
-            recipe__shopping_cart__user=user.id)
-        .values('ingredient__name', 'ingredient__measurement_unit')
-        .annotate(amount=Sum('amount'))
-    )
+    """Скачивание корзины покупок, собранной из документов рецептов."""
+    rows = fill_documents(list(Recipe.objects.filter(
+        shopping_cart__user=request.user.id).values('id', 'document')))
+    amounts = {}
+    for row in rows:
+        for _, name, amount, unit in row['document']['ingredients']:
+            amounts[name, unit] = amounts.get((name, unit), 0) + amount
     filename = 'ingredients shopping list.txt'
     content = "\n".join(
         [
-            f'{ingredient["ingredient__name"]} -'
-            f' {ingredient["amount"]}'
-            f' {ingredient["ingredient__measurement_unit"]}'
-            for ingredient in list_recipes
+            f'{name} - {amount} {unit}'
+            for (name, unit), amount in sorted(amounts.items())
         ]
     )
     response = HttpResponse(content, content_type='text/plain')
@@ -223,8 +541,29 @@ class GetShortLinkView(views.APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        recipe, _ = RecipeShortLink.objects.get_or_create(recipe=recipe)
-        short_link = recipe.get_short_link()
+        """
+        Ссылка создаётся фоновой задачей при публикации рецепта;
+        здесь — только для рецептов, у которых её ещё нет.
+        """
+        short_link = RecipeShortLink.objects.filter(
+            recipe_id=pk).values_list('short_link', flat=True).first()
+        if short_link is None:
+            recipe = get_object_or_404(Recipe.objects, id=pk)
+            recipe, _ = RecipeShortLink.objects.get_or_create(recipe=recipe)
+            short_link = recipe.get_short_link()
         absolute_short_link = f"{settings.BASE_URL}api/s/{short_link}/"
         return Response({"get_link": absolute_short_link}, status=200)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request):
+    """Метрики пула соединений с БД текущего воркера."""
+    return Response(get_pool_stats())
+
+
+def metrics(request):
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    update_queue_metrics()
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
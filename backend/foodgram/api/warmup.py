@@ -0,0 +1,89 @@
+"""
+Прогрев процесса при запуске.
+
+При preload_app gunicorn приложение загружается в мастере, и прогрев
+выполняется до форка: импорты, разобранные маршруты, метаданные
+моделей и классы сериализаторов достаются воркерам через
+copy-on-write, а первые запросы каждого воркера не платят за холодный
+старт. Запросы к представлениям выполняются без аутентификации,
+ограничения частоты и middleware; соединения с БД после прогрева
+закрываются, чтобы не попасть в воркеры.
+"""
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve
+
+from .serializers import (CustomUserSerializer, IngredientSerializer,
+                          RecipeSerializer, ShortRecipeSerializer,
+                          SubscriptionsSerialiazer, TagSerializer)
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from core.db.pool import close_pools
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/1/',
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/users/',
+    '/api/users/me/',
+)
+WARM_UP_VIEWS = (
+    (TagViewSet, '/api/tags/'),
+    (IngredientViewSet, '/api/ingredients/'),
+    (IngredientViewSet, '/api/ingredients/?name=а'),
+    (RecipeViewSet, '/api/recipes/'),
+)
+WARM_UP_SERIALIZERS = (
+    CustomUserSerializer, IngredientSerializer, RecipeSerializer,
+    ShortRecipeSerializer, SubscriptionsSerialiazer, TagSerializer,
+)
+
+
+def warm_up_routes():
+    get_resolver().reverse_dict
+    for path in WARM_UP_PATHS:
+        resolve(path)
+
+
+def warm_up_models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def warm_up_serializers():
+    for serializer_class in WARM_UP_SERIALIZERS:
+        serializer_class().fields
+
+
+def warm_up_views():
+    """Чтение каталогов тегов и ингредиентов и первой страницы рецептов."""
+    factory = RequestFactory()
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                 if host != '*'), 'localhost')
+    for view_class, path in WARM_UP_VIEWS:
+        view = view_class.as_view(
+            {'get': 'list'}, authentication_classes=(), throttle_classes=())
+        view(factory.get(path, SERVER_NAME=host)).render()
+
+
+def warm_up():
+    """Прогрев; ошибки (например, недоступная БД) не мешают запуску."""
+    started = time.perf_counter()
+    for stage in (warm_up_routes, warm_up_models, warm_up_serializers,
+                  warm_up_views):
+        try:
+            stage()
+        except Exception:
+            logger.warning('Прогрев %s не выполнен.', stage.__name__,
+                           exc_info=True)
+    connections.close_all()
+    close_pools()
+    logger.info('Прогрев завершён за %.2f с.',
+                time.perf_counter() - started)
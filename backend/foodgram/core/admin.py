@@ -1,19 +1,51 @@
 from django.contrib import admin
 
 from .constants import EMPTY_FIELD_MSG
-from .models import CustomUser as User
+from .models import CustomUser as User, Task
+from recipes import deletion
 from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredients,
-                            RecipeShortLink, ShoppingCart, Subscribe, Tag)
+                            RecipeShortLink, ShoppingCart, Subscribe, Tag,
+                            TimelineEntry)
+
+
+class HideOnDeleteAdmin(admin.ModelAdmin):
+    """
+    Удаление через скрытие и фоновую очистку (recipes.deletion):
+    без каскада в запросе и без сбора связанных объектов
+    для страницы подтверждения.
+    """
+    hide = None
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted__isnull=True)
+
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        self.hide(self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.hide(queryset)
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(HideOnDeleteAdmin):
+    hide = staticmethod(deletion.hide_users)
     search_fields = ['username', 'email']
     empty_value_display = EMPTY_FIELD_MSG
 
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'run_at', 'attempts', 'created']
+    list_filter = ['status', 'name']
+    empty_value_display = EMPTY_FIELD_MSG
+
+
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(HideOnDeleteAdmin):
+    hide = staticmethod(deletion.hide_recipes)
     list_display = ['name', 'author', 'get_favorite_count']
     search_fields = ['author__first_name', 'name']
     list_filter = ['tags']
@@ -36,3 +68,4 @@ admin.site.register(Subscribe)
 admin.site.register(Favorites)
 admin.site.register(ShoppingCart)
 admin.site.register(RecipeShortLink)
+admin.site.register(TimelineEntry)
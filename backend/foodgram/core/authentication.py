@@ -0,0 +1,124 @@
+"""
+Аутентификация по токену с кэшем.
+
+Пользователь токена хранится в общем кэше (Redis) и в памяти процесса
+в виде JSON с полями AUTH_USER_FIELDS; пароль и остальные поля в кэш
+не попадают и при обращении читаются из БД. Запись в памяти процесса
+действительна, пока не изменилась версия токена в общем кэше: выход,
+смена пароля, деактивация и другие изменения пользователя удаляют
+запись токена из общего кэша и меняют его версию, так что во всех
+воркерах она перестаёт действовать сразу, а записи других токенов
+остаются. Неверные токены кэшируются на меньшее время.
+"""
+import hashlib
+import time
+
+import orjson
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.constants import AuthTokenCacheLimits
+from core.metrics import record_cache
+from core.models import CustomUser as User
+
+AUTH_USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name',
+                    'avatar', 'is_active', 'is_staff', 'is_superuser')
+INVALID_TOKEN = 'Invalid token.'
+INACTIVE_USER = 'User inactive or deleted.'
+
+_local = {}
+
+
+def _cache_keys(key):
+    """Ключи записи токена и его версии в общем кэше."""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return 'auth:token:' + digest, 'auth:version:' + digest
+
+
+def _load(key):
+    """Пользователь токена из БД: JSON с полями или текст ошибки."""
+    user = Token.objects.filter(key=key).values(
+        *(f'user__{name}' for name in AUTH_USER_FIELDS)).first()
+    if user is None:
+        return INVALID_TOKEN
+    if not user['user__is_active']:
+        return INACTIVE_USER
+    return orjson.dumps({
+        name: user[f'user__{name}'] for name in AUTH_USER_FIELDS})
+
+
+def _build_user(data):
+    """
+    Пользователь из полей кэша. Остальные поля отложены (как у only()):
+    они читаются из БД при обращении и не затираются при save().
+    """
+    fields = orjson.loads(data)
+    field_names = [field.attname for field in User._meta.concrete_fields
+                   if field.attname in fields]
+    return User.from_db(router.db_for_write(User), field_names,
+                        [fields[name] for name in field_names])
+
+
+def _remember(cache_key, version, data):
+    if len(_local) >= AuthTokenCacheLimits.LOCAL_MAX_SIZE:
+        _local.pop(next(iter(_local), None), None)
+    timeout = (AuthTokenCacheLimits.LOCAL_TIMEOUT if isinstance(data, bytes)
+               else AuthTokenCacheLimits.NEGATIVE_TIMEOUT)
+    _local[cache_key] = (version, time.monotonic() + timeout, data)
+
+
+def get_token_user(key):
+    """
+    Пользователь по ключу токена. Для неверного токена или
+    неактивного пользователя возвращается текст ошибки.
+    """
+    cache_key, version_key = _cache_keys(key)
+    version = cache.get(version_key)
+    entry = _local.get(cache_key)
+    local_hit = (entry is not None and entry[0] == version
+                 and entry[1] > time.monotonic())
+    record_cache('auth_token_local', local_hit)
+    if local_hit:
+        data = entry[2]
+    else:
+        data = cache.get(cache_key)
+        record_cache('auth_token', data is not None)
+        if data is None:
+            data = _load(key)
+            # Токен могли отозвать, пока шло чтение из БД.
+            if cache.get(version_key) == version:
+                cache.set(cache_key, data, (
+                    AuthTokenCacheLimits.CACHE_TIMEOUT
+                    if isinstance(data, bytes)
+                    else AuthTokenCacheLimits.NEGATIVE_TIMEOUT))
+        _remember(cache_key, version, data)
+    return _build_user(data) if isinstance(data, bytes) else data
+
+
+def revoke(keys):
+    """
+    Удаление токенов из кэшей всех воркеров: новая версия токена
+    живёт дольше любой записи о нём в памяти процессов.
+    """
+    if not keys:
+        return
+    cache_keys, version_keys = zip(*(_cache_keys(key) for key in keys))
+    cache.delete_many(cache_keys)
+    cache.set_many(dict.fromkeys(version_keys, time.time_ns()),
+                   AuthTokenCacheLimits.CACHE_TIMEOUT)
+    for cache_key in cache_keys:
+        _local.pop(cache_key, None)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД при попадании в кэш."""
+
+    def authenticate_credentials(self, key):
+        user = get_token_user(key)
+        if isinstance(user, str):
+            raise exceptions.AuthenticationFailed(_(user))
+        return user, Token(key=key, user=user)
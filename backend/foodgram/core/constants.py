@@ -25,4 +25,107 @@ class CustomUserLimits():
     MAX_LEN_PASS = 255
 
 
+class TimelineLimits():
+    """
+    Класс, содержащий константы
+    для ленты рецептов авторов из подписок.
+    """
+    FANOUT_BATCH_SIZE = 1000
+    CELEBRITY_FOLLOWERS = 5000
+    BACKFILL_RECIPES = 50
+    CELEBRITIES_CACHE_TIMEOUT = 300
+
+
+class DocumentLimits():
+    """
+    Класс, содержащий константы
+    для денормализованных документов рецептов.
+    """
+    REBUILD_BATCH_SIZE = 500
+    REBUILD_QUEUED_TIMEOUT = 300
+
+
+class ViewerRelationsLimits():
+    """
+    Класс, содержащий константы
+    для кэша отношений пользователя.
+    """
+    CACHE_TIMEOUT = 3600
+
+
+class AuthTokenCacheLimits():
+    """
+    Класс, содержащий константы
+    для кэша аутентификации по токену.
+    """
+    CACHE_TIMEOUT = 300
+    LOCAL_TIMEOUT = 60
+    NEGATIVE_TIMEOUT = 30
+    LOCAL_MAX_SIZE = 10000
+
+
+class BulkLimits():
+    """
+    Класс, содержащий константы
+    для пакетного изменения избранного, корзины и подписок.
+    """
+    MAX_IDS = 100
+    MAX_ID = 2 ** 63 - 1
+
+
+class TaskQueueLimits():
+    """
+    Класс, содержащий константы
+    для очереди фоновых задач.
+    """
+    MAX_LEN_NAME = 200
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY = 10
+    TIMEOUT = 300
+    POLL_INTERVAL = 1.0
+
+
+class QueryPlanLimits():
+    """
+    Класс, содержащий константы
+    для проверки планов запросов.
+    """
+    SEED_USERS = 20_000
+    SEED_RECIPES = 200_000
+    LARGE_TABLE_ROWS = 10_000
+    COST_FACTOR = 2.0
+
+
+class RankingLimits():
+    """
+    Класс, содержащий константы
+    для рейтинга популярных рецептов.
+    """
+    WINDOW_DAYS = 7
+    HALF_LIFE_HOURS = 48
+    FAVORITE_WEIGHT = 1.0
+    CART_WEIGHT = 2.0
+    BATCH_SIZE = 1000
+
+
+class ExportLimits():
+    """
+    Класс, содержащий константы
+    для выгрузки каталога рецептов.
+    """
+    CHUNK_SIZE = 2000
+    SINCE_OVERLAP = 300
+
+
+class DeletionLimits():
+    """
+    Класс, содержащий константы
+    для фонового удаления пользователей и рецептов.
+    """
+    BATCH_SIZE = 1000
+    RECIPE_BATCH_SIZE = 100
+    PAUSE = 0.05
+    TIME_BUDGET = 60
+
+
 EMPTY_FIELD_MSG = '-пусто-'
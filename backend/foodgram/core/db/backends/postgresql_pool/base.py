@@ -0,0 +1,25 @@
+from django.db.backends.postgresql import base
+
+from core.db.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL, берущий соединения из пула процесса.
+    Параметры пула задаются ключом POOL в настройках БД.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params)
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
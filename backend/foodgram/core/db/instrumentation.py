@@ -0,0 +1,97 @@
+"""Учёт запросов к БД: количество, суммарное время, самый медленный."""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов, чем допускает бюджет."""
+
+
+class QueryRecorder:
+    """Обёртка выполнения запросов (connection.execute_wrapper)."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slowest_duration:
+                self.slowest_duration = elapsed
+                self.slowest_sql = sql
+
+    @contextmanager
+    def record(self):
+        """Учёт запросов ко всем БД в текущем потоке."""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(self))
+            yield self
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        header = (f'db;dur={self.duration * 1000:.2f};'
+                  f'desc="{self.count} queries"')
+        if self.slowest_sql:
+            statement = self.slowest_sql[:100].replace('"', "'")
+            header += (f', db-slowest;dur={self.slowest_duration * 1000:.2f}'
+                       f';desc="{statement}"')
+        return header
+
+
+def get_budget_key(method, view_name):
+    """Ключ QUERY_BUDGETS: метод и имя представления, HEAD — как GET."""
+    return f'{"GET" if method == "HEAD" else method} {view_name}'
+
+
+def get_query_budget(key):
+    """Бюджет для PostgreSQL или запасной бюджет для других БД."""
+    if connections[DEFAULT_DB_ALIAS].vendor != 'postgresql':
+        budget = settings.QUERY_BUDGETS_FALLBACK.get(key)
+        if budget is not None:
+            return budget
+    return settings.QUERY_BUDGETS.get(key)
+
+
+def check_query_budget(key, recorder, strict=None):
+    """
+    Сверка числа запросов с бюджетом метода представления:
+    превышение логируется, а в строгом режиме вызывает исключение.
+    """
+    budget = get_query_budget(key)
+    if budget is None or recorder.count <= budget:
+        return True
+    message = (f'{key}: {recorder.count} запросов к БД '
+               f'при бюджете {budget}.')
+    if settings.QUERY_BUDGET_STRICT if strict is None else strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+    return False
+
+
+@contextmanager
+def assert_query_budget(key):
+    """
+    Проверка бюджета в проверках и тестах:
+
+        with assert_query_budget('GET api:recipes-list'):
+            client.get('/api/recipes/')
+    """
+    with QueryRecorder().record() as recorder:
+        yield recorder
+    check_query_budget(key, recorder, strict=True)
@@ -0,0 +1,192 @@
+"""Пул соединений с БД в пределах одного процесса (воркера)."""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import DatabaseError
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(DatabaseError):
+    """Не удалось получить соединение из пула за отведённое время."""
+
+
+class ConnectionPool:
+    """
+    Пул соединений с ограничением размера, таймаутом ожидания
+    и проверкой соединений, долго простаивавших в пуле.
+    """
+
+    def __init__(self, max_size=10, timeout=5.0, check_after=30.0,
+                 max_lifetime=1800.0):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_lifetime = max_lifetime
+        self._idle = deque()
+        self._born = {}
+        self._size = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._counters = {
+            'acquired': 0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'acquire_seconds_total': 0.0,
+            'acquire_seconds_max': 0.0,
+        }
+
+    def acquire(self, connect):
+        """Соединение из пула; новое создаётся вызовом connect()."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'Нет свободных соединений в пуле '
+                        f'({self.max_size}) за {self.timeout} с.'
+                    )
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+        if connection is not None and not self._is_healthy(
+                connection, released_at):
+            self._discard(connection, reserve=True)
+            connection = None
+        if connection is None:
+            connection = self._create(connect)
+        self._record_acquire(time.monotonic() - started)
+        return connection
+
+    def release(self, connection):
+        """Возврат соединения в пул после отката незавершённой транзакции."""
+        if connection.closed or self._is_expired(connection):
+            self._discard(connection)
+            return
+        try:
+            if connection.info.transaction_status:
+                connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'max_size': self.max_size,
+                **self._counters,
+            }
+
+    def close_idle(self):
+        """Закрытие простаивающих соединений."""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _create(self, connect):
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._born[id(connection)] = time.monotonic()
+            self._counters['created'] += 1
+        return connection
+
+    def _discard(self, connection, reserve=False):
+        """Закрытие соединения; с reserve место в пуле остаётся занятым."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._born.pop(id(connection), None)
+            self._counters['discarded'] += 1
+            if not reserve:
+                self._size -= 1
+                self._condition.notify()
+
+    def _is_expired(self, connection):
+        born = self._born.get(id(connection))
+        return born is None or time.monotonic() - born > self.max_lifetime
+
+    def _is_healthy(self, connection, released_at):
+        if connection.closed or self._is_expired(connection):
+            return False
+        if time.monotonic() - released_at < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _record_acquire(self, elapsed):
+        with self._condition:
+            self._counters['acquired'] += 1
+            self._counters['acquire_seconds_total'] += elapsed
+            self._counters['acquire_seconds_max'] = max(
+                self._counters['acquire_seconds_max'], elapsed)
+
+
+def get_pool(alias, options):
+    """Пул текущего процесса для псевдонима БД."""
+    key = (alias, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(**options)
+    return pool
+
+
+def get_pool_stats():
+    """Метрики всех пулов текущего процесса."""
+    pid = os.getpid()
+    return {
+        alias: pool.stats()
+        for (alias, pool_pid), pool in list(_pools.items())
+        if pool_pid == pid
+    }
+
+
+def close_pools():
+    """
+    Закрытие простаивающих соединений пулов текущего процесса,
+    например в мастере gunicorn перед форком воркеров.
+    """
+    pid = os.getpid()
+    for (alias, pool_pid), pool in list(_pools.items()):
+        if pool_pid == pid:
+            pool.close_idle()
@@ -0,0 +1,34 @@
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+# Модели, которые всегда читаются с основной БД: токен выдаётся
+# на запись и сразу используется следующим запросом клиента.
+PRIMARY_ONLY_MODELS = {'authtoken.token'}
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Маршрутизатор БД: чтение в безопасных запросах идёт на реплику
+    (если она настроена), запись и чтение внутри транзакций — на основную.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            use_replica.get()
+            and REPLICA_DB_ALIAS in connections.settings
+            and model._meta.label_lower not in PRIMARY_ONLY_MODELS
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
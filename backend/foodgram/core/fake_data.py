@@ -0,0 +1,308 @@
+"""
+Детерминированная генерация больших наборов данных
+для бенчмарков и воспроизведения проблем масштабирования.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from recipes import documents
+from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Subscribe, Tag)
+
+from core.models import CustomUser as User
+
+INGREDIENTS_HISTOGRAM = {
+    3: 8, 4: 14, 5: 18, 6: 18, 7: 14, 8: 10, 9: 7, 10: 5, 12: 4, 15: 2,
+}
+START_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r',
+})
+
+
+def zipf_cum_weights(size, exponent):
+    """Накопленные веса рангов 1..size для random.choices."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def copy_value(value):
+    """Значение в текстовом формате COPY."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+class CopyStream:
+    """Файлоподобный поток строк для cursor.copy_expert()."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class DatasetGenerator:
+    """
+    Генератор пользователей, рецептов, ингредиентов рецептов,
+    избранного, корзин и подписок. Одинаковые параметры и seed
+    дают одинаковые данные; первичные ключи назначаются явно.
+
+    В PostgreSQL строки передаются потоком через COPY,
+    в остальных БД — пакетными INSERT.
+    """
+
+    def __init__(self, users=3000, recipes=100_000, seed=42,
+                 prefix='bench', authors_share=0.3, author_exponent=1.1,
+                 recipe_exponent=0.9, favorites_per_user=20,
+                 cart_per_user=4, subscriptions_per_user=10,
+                 ingredients_histogram=None, batch_size=5000, stdout=None):
+        self.users = users
+        self.recipes = recipes
+        self.seed = seed
+        self.prefix = prefix
+        self.authors = max(1, int(users * authors_share))
+        self.author_exponent = author_exponent
+        self.recipe_exponent = recipe_exponent
+        self.favorites_per_user = favorites_per_user
+        self.cart_per_user = cart_per_user
+        self.subscriptions_per_user = subscriptions_per_user
+        self.ingredients_histogram = (ingredients_histogram
+                                      or INGREDIENTS_HISTOGRAM)
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.rng = random.Random(seed)
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def next_id(self, model):
+        """Следующий id с учётом строк, скрытых менеджером (deleted)."""
+        return (model._base_manager.aggregate(
+            max_id=models.Max('pk'))['max_id'] or 0) + 1
+
+    def write(self, model, columns, rows):
+        if connection.vendor == 'postgresql':
+            return self.write_copy(model, columns, rows)
+        return self.write_batches(model, columns, rows)
+
+    def write_copy(self, model, columns, rows):
+        """Потоковая загрузка строк через COPY FROM STDIN."""
+        counter = {'rows': 0}
+
+        def chunks():
+            for chunk in chunked(rows, self.batch_size):
+                counter['rows'] += len(chunk)
+                yield ''.join(
+                    '\t'.join(map(copy_value, row)) + '\n' for row in chunk
+                ).encode()
+
+        table = connection.ops.quote_name(model._meta.db_table)
+        column_list = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(name).column)
+            for name in columns)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {table} ({column_list}) FROM STDIN',
+                CopyStream(chunks())
+            )
+        return counter['rows']
+
+    def write_batches(self, model, columns, rows):
+        """Пакетная вставка строк в обход сигналов и pre_save."""
+        fields = [model._meta.get_field(name) for name in columns]
+        adapters = [
+            connection.ops.adapt_datetimefield_value
+            if isinstance(field, models.DateTimeField) else None
+            for field in fields
+        ]
+        table = connection.ops.quote_name(model._meta.db_table)
+        column_list = ', '.join(
+            connection.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = f'INSERT INTO {table} ({column_list}) VALUES ({placeholders})'
+        total = 0
+        with connection.cursor() as cursor:
+            for chunk in chunked(rows, self.batch_size):
+                cursor.executemany(sql, [
+                    tuple(adapt(value) if adapt else value
+                          for adapt, value in zip(adapters, row))
+                    for row in chunk
+                ])
+                total += len(chunk)
+        return total
+
+    def reset_sequences(self, model_list):
+        statements = connection.ops.sequence_reset_sql(no_style(), model_list)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def ensure_catalog(self):
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients')
+        if not Tag.objects.exists():
+            call_command('load_tags')
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        self.tag_ids = list(
+            Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def sample_popular(self, population, cum_weights, count, exclude=None):
+        """Неповторяющаяся выборка с распределением Ципфа."""
+        count = min(count, len(population) - (1 if exclude else 0))
+        chosen = set()
+        while len(chosen) < count:
+            for item in self.rng.choices(
+                    population, cum_weights=cum_weights,
+                    k=count - len(chosen)):
+                if item != exclude:
+                    chosen.add(item)
+        return sorted(chosen)
+
+    def random_count(self, mean):
+        """Число связей пользователя: экспоненциальное распределение."""
+        return int(self.rng.expovariate(1 / mean)) if mean else 0
+
+    def generate_users(self, first_id):
+        for pk in range(first_id, first_id + self.users):
+            yield (pk, '!', False, f'{self.prefix}-{pk}',
+                   f'Имя {pk}', f'Фамилия {pk}',
+                   f'{self.prefix}-{pk}@example.com', False, True, START_DATE)
+
+    def generate_recipes(self, first_id, author_ids):
+        cum_weights = zipf_cum_weights(len(author_ids), self.author_exponent)
+        authors = self.rng.choices(
+            author_ids, cum_weights=cum_weights, k=self.recipes)
+        pub_date = START_DATE
+        for pk, author_id in enumerate(authors, start=first_id):
+            pub_date += timedelta(seconds=self.rng.randint(1, 600))
+            yield (pk, author_id, f'Рецепт {pk}',
+                   f'recipes/images/{self.prefix}.png',
+                   'Описание рецепта. ' * self.rng.randint(1, 20),
+                   self.rng.randint(1, 180), pub_date, pub_date, False)
+
+    def generate_recipe_ingredients(self, first_id, recipe_ids):
+        sizes, weights = zip(*self.ingredients_histogram.items())
+        pk = first_id
+        for recipe_id in recipe_ids:
+            size = min(self.rng.choices(sizes, weights=weights)[0],
+                       len(self.ingredient_ids))
+            for ingredient_id in self.rng.sample(self.ingredient_ids, size):
+                yield pk, recipe_id, ingredient_id, self.rng.randint(1, 500)
+                pk += 1
+
+    def generate_recipe_tags(self, first_id, recipe_ids):
+        pk = first_id
+        for recipe_id in recipe_ids:
+            size = self.rng.randint(1, min(3, len(self.tag_ids)))
+            for tag_id in self.rng.sample(self.tag_ids, size):
+                yield pk, recipe_id, tag_id
+                pk += 1
+
+    def random_event_date(self):
+        """Время события в пределах периода публикации рецептов."""
+        return START_DATE + timedelta(
+            seconds=self.rng.randint(0, self.recipes * 300))
+
+    def generate_user_relations(self, first_id, user_ids, targets,
+                                exponent, mean, exclude_self=False,
+                                created=False):
+        """
+        Связи пользователь — цель (рецепт или автор) без повторов;
+        с created=True — со временем добавления.
+        """
+        cum_weights = zipf_cum_weights(len(targets), exponent)
+        pk = first_id
+        for user_id in user_ids:
+            for target_id in self.sample_popular(
+                    targets, cum_weights, self.random_count(mean),
+                    exclude=user_id if exclude_self else None):
+                if created:
+                    yield pk, user_id, target_id, self.random_event_date()
+                else:
+                    yield pk, user_id, target_id
+                pk += 1
+
+    @transaction.atomic
+    def generate(self):
+        """Генерация набора данных; возвращает число строк по таблицам."""
+        self.ensure_catalog()
+        through = Recipe.tags.through
+        first_user = self.next_id(User)
+        user_ids = list(range(first_user, first_user + self.users))
+        author_ids = self.rng.sample(user_ids, self.authors)
+        first_recipe = self.next_id(Recipe)
+        recipe_ids = list(range(first_recipe, first_recipe + self.recipes))
+        popular_recipes = self.rng.sample(recipe_ids, len(recipe_ids))
+        popular_authors = self.rng.sample(author_ids, len(author_ids))
+
+        steps = [
+            (User, ('id', 'password', 'is_superuser', 'username',
+                    'first_name', 'last_name', 'email', 'is_staff',
+                    'is_active', 'date_joined'),
+             lambda: self.generate_users(first_user)),
+            (Recipe, ('id', 'author', 'name', 'image', 'text',
+                      'cooking_time', 'pub_date', 'updated', 'pulled'),
+             lambda: self.generate_recipes(first_recipe, author_ids)),
+            (RecipeIngredients, ('id', 'recipe', 'ingredient', 'amount'),
+             lambda: self.generate_recipe_ingredients(
+                 self.next_id(RecipeIngredients), recipe_ids)),
+            (through, ('id', 'recipe', 'tag'),
+             lambda: self.generate_recipe_tags(
+                 self.next_id(through), recipe_ids)),
+            (Favorites, ('id', 'user', 'recipe', 'created'),
+             lambda: self.generate_user_relations(
+                 self.next_id(Favorites), user_ids, popular_recipes,
+                 self.recipe_exponent, self.favorites_per_user,
+                 created=True)),
+            (ShoppingCart, ('id', 'user', 'recipe', 'created'),
+             lambda: self.generate_user_relations(
+                 self.next_id(ShoppingCart), user_ids, popular_recipes,
+                 self.recipe_exponent, self.cart_per_user, created=True)),
+            (Subscribe, ('id', 'user', 'author'),
+             lambda: self.generate_user_relations(
+                 self.next_id(Subscribe), user_ids, popular_authors,
+                 self.author_exponent, self.subscriptions_per_user,
+                 exclude_self=True)),
+        ]
+        counts = {}
+        for model, columns, rows in steps:
+            started = time.perf_counter()
+            table = model._meta.db_table
+            counts[table] = self.write(model, columns, rows())
+            self.log(f'{table}: {counts[table]} '
+                     f'({time.perf_counter() - started:.1f} с)')
+        self.reset_sequences([model for model, _, _ in steps])
+        # Строки записаны в обход ORM: документы рецептов собираются здесь.
+        started = time.perf_counter()
+        rebuilt = documents.rebuild(recipe_ids, self.batch_size)
+        self.log(f'Документы рецептов: {rebuilt} '
+                 f'({time.perf_counter() - started:.1f} с)')
+        return counts
@@ -4,7 +4,12 @@ from recipes.models import Ingredient, Recipe, Tag
 
 
 class RecipeFilter(FilterSet):
-    """Фильтр рецептов по тегам; вкладе 'избранное'; корзине покупок."""
+    """
+    Фильтр рецептов по тегам; вкладе 'избранное'; корзине покупок.
+    ordering=popular оставляет рецепты из рейтинга популярности.
+    """
+    POPULAR = 'popular'
+
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug', to_field_name='slug',
         lookup_expr='istartswith', queryset=Tag.objects.all()
@@ -13,10 +18,14 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=((POPULAR, 'Популярные'),), method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'ordering']
 
     def filter_is_favorited(self, queryset, name, values):
         user = self.request.user
@@ -30,6 +39,14 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=user)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        """Порядок задаёт PopularityPagination."""
+        return queryset.filter(ranking__isnull=False)
+
+    @classmethod
+    def is_popular(cls, request):
+        return request.GET.get('ordering') == cls.POPULAR
+
 
 class IngredientNameFilter(FilterSet):
     """Фильтр для поиска ингредиентов по названию."""
@@ -0,0 +1,154 @@
+"""
+Метрики приложения в формате Prometheus.
+
+Под gunicorn значения воркеров пишутся в файлы каталога
+PROMETHEUS_MULTIPROC_DIR и суммируются при выдаче /metrics.
+"""
+import os
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+from core.db.pool import get_pool_stats
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+UNMATCHED_ROUTE = 'unmatched'
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Длительность обработки запроса.',
+    ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSES = Counter(
+    'foodgram_http_responses_total',
+    'Ответы по кодам статуса.',
+    ['method', 'route', 'status'],
+)
+IN_PROGRESS = Gauge(
+    'foodgram_http_requests_in_progress',
+    'Запросы в обработке во всех воркерах.',
+    multiprocess_mode='livesum',
+)
+THROTTLED = Counter(
+    'foodgram_http_throttled_total',
+    'Запросы, отклонённые ограничением частоты (429).',
+    ['route'],
+)
+REQUEST_BODY_SIZE = Histogram(
+    'foodgram_http_request_body_bytes',
+    'Размер тела изменяющих запросов, в том числе загрузок изображений.',
+    ['route'],
+    buckets=(1024, 10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2,
+             5 * 1024 ** 2, 10 * 1024 ** 2),
+)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries_per_request',
+    'Число запросов к БД за время обработки запроса.',
+    ['route'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_DURATION = Histogram(
+    'foodgram_db_duration_seconds',
+    'Суммарное время запросов к БД за время обработки запроса.',
+    ['route'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшам приложения: попадания и промахи.',
+    ['cache', 'result'],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'foodgram_db_pool_connections',
+    'Соединения пулов БД по состоянию.',
+    ['alias', 'state'],
+    multiprocess_mode='livesum',
+)
+DB_POOL_TIMEOUTS = Gauge(
+    'foodgram_db_pool_timeouts',
+    'Таймауты ожидания соединения из пула с запуска воркеров.',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+TASKS = Counter(
+    'foodgram_tasks_total',
+    'Выполнения фоновых задач по результату.',
+    ['task', 'result'],
+)
+TASK_DURATION = Histogram(
+    'foodgram_task_duration_seconds',
+    'Длительность выполнения фоновой задачи.',
+    ['task'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+TASK_LAG = Histogram(
+    'foodgram_task_lag_seconds',
+    'Задержка начала выполнения задачи после запланированного времени.',
+    ['task'],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900),
+)
+TASKS_PENDING = Gauge(
+    'foodgram_tasks_in_queue',
+    'Задачи в очереди по статусу.',
+    ['status'],
+    multiprocess_mode='mostrecent',
+)
+
+
+def get_route(request):
+    """Имя маршрута вместо пути, чтобы не плодить метки."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNMATCHED_ROUTE
+
+
+def observe_request(request, response, duration):
+    route = get_route(request)
+    method = request.method
+    REQUEST_DURATION.labels(method, route).observe(duration)
+    RESPONSES.labels(method, route, response.status_code).inc()
+    if response.status_code == 429:
+        THROTTLED.labels(route).inc()
+    if method in BODY_METHODS:
+        REQUEST_BODY_SIZE.labels(route).observe(
+            int(request.META.get('CONTENT_LENGTH') or 0))
+
+
+def observe_queries(route, recorder):
+    DB_QUERIES.labels(route).observe(recorder.count)
+    DB_DURATION.labels(route).observe(recorder.duration)
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def update_pool_metrics():
+    for alias, stats in get_pool_stats().items():
+        for state in ('in_use', 'idle', 'waiting'):
+            DB_POOL_CONNECTIONS.labels(alias, state).set(stats[state])
+        DB_POOL_TIMEOUTS.labels(alias).set(stats['timeouts'])
+
+
+def observe_task(name, result, duration):
+    TASKS.labels(name, result).inc()
+    TASK_DURATION.labels(name).observe(duration)
+
+
+def get_registry():
+    """Реестр метрик всех процессов или только текущего."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """Текст метрик и его Content-Type."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
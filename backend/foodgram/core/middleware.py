@@ -0,0 +1,160 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db.instrumentation import (QueryRecorder, check_query_budget,
+                                     get_budget_key)
+from core.db.routers import use_replica
+from core.metrics import (IN_PROGRESS, get_route, observe_queries,
+                          observe_request, update_pool_metrics)
+
+
+class MetricsMiddleware:
+    """
+    Метрики запроса: длительность, код ответа, размер тела,
+    отказы по троттлингу и число запросов в обработке.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        IN_PROGRESS.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            IN_PROGRESS.dec()
+        observe_request(request, response, time.perf_counter() - started)
+        update_pool_metrics()
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        IN_PROGRESS.inc()
+        try:
+            response = await self.get_response(request)
+        finally:
+            IN_PROGRESS.dec()
+        observe_request(request, response, time.perf_counter() - started)
+        update_pool_metrics()
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Направляет чтение безопасных запросов на реплику БД.
+    После изменяющего запроса клиент на REPLICA_PIN_SECONDS
+    закрепляется за основной БД (read-your-writes).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_pin_key(self, request):
+        credentials = (request.headers.get('Authorization')
+                       or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        if not credentials:
+            return None
+        return 'db-pin:' + hashlib.sha1(credentials.encode()).hexdigest()
+
+    def use_replica(self, request, pin_key):
+        return request.method in SAFE_METHODS and not (
+            pin_key and cache.get(pin_key))
+
+    def pin(self, request, response, pin_key):
+        if pin_key and request.method not in SAFE_METHODS:
+            cache.set(pin_key, True, settings.REPLICA_PIN_SECONDS)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pin_key = self.get_pin_key(request)
+        token = use_replica.set(self.use_replica(request, pin_key))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        self.pin(request, response, pin_key)
+        return response
+
+    async def __acall__(self, request):
+        pin_key = self.get_pin_key(request)
+        token = use_replica.set(self.use_replica(request, pin_key))
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        self.pin(request, response, pin_key)
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Учёт запросов к БД за время обработки запроса и сверка
+    с бюджетом метода представления (QUERY_BUDGETS) и в метриках. Сотрудникам
+    (или всем при SERVER_TIMING_FOR_ALL) метрики отдаются
+    в заголовке Server-Timing.
+
+    execute_wrapper действует в потоке, в котором ORM выполняет запросы.
+    Под ASGI это поток синхронного кода запроса (thread_sensitive):
+    обёртка ставится и снимается в нём, а ответ ожидается асинхронно.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def process(self, request, response, recorder):
+        if request.resolver_match is not None:
+            check_query_budget(get_budget_key(
+                request.method, request.resolver_match.view_name), recorder)
+        observe_queries(get_route(request), recorder)
+        user = getattr(request, 'user', None)
+        if settings.SERVER_TIMING_FOR_ALL or (
+                user is not None and user.is_staff):
+            response['Server-Timing'] = recorder.server_timing()
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+        return self.process(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        stack = ExitStack()
+        await sync_to_async(stack.enter_context)(recorder.record())
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(stack.close)()
+            raise
+
+        def finish():
+            """Пользователь сессии может загружаться из БД."""
+            stack.close()
+            return self.process(request, response, recorder)
+
+        return await sync_to_async(finish)()
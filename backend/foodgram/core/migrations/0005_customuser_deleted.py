@@ -0,0 +1,35 @@
+# Generated by Django 4.2.15 on 2026-10-19 11:29
+
+import core.models
+import django.contrib.auth.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_task'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customuser',
+            options={'default_manager_name': 'all_objects', 'ordering': ('email',), 'verbose_name': 'пользователь', 'verbose_name_plural': 'Пользователи'},
+        ),
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', core.models.CustomUserManager()),
+                ('all_objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='deleted',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалён'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['deleted'], name='user_deleted_idx'),
+        ),
+    ]
@@ -1,8 +1,21 @@
-from django.contrib.auth.models import AbstractUser, PermissionsMixin
+from django.contrib.auth.models import (AbstractUser, PermissionsMixin,
+                                        UserManager)
 from django.core.validators import EmailValidator, RegexValidator
 from django.db import models
+from django.utils import timezone
 
-from .constants import CustomUserLimits
+from .constants import CustomUserLimits, TaskQueueLimits
+
+
+class NotDeletedManager(models.Manager):
+    """Менеджер без скрытых объектов, ожидающих удаления."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted__isnull=True)
+
+
+class CustomUserManager(NotDeletedManager, UserManager):
+    pass
 
 
 class CustomUser(AbstractUser, PermissionsMixin):
@@ -50,6 +63,15 @@ class CustomUser(AbstractUser, PermissionsMixin):
         "active",
         default=True
     )
+    deleted = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Удалён',
+    )
+
+    objects = CustomUserManager()
+    all_objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [email]
@@ -58,6 +80,72 @@ class CustomUser(AbstractUser, PermissionsMixin):
         ordering = ('email',)
         verbose_name = 'пользователь'
         verbose_name_plural = 'Пользователи'
+        default_manager_name = 'all_objects'
+        indexes = [
+            models.Index(
+                fields=('deleted',),
+                condition=models.Q(deleted__isnull=False),
+                name='user_deleted_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.username
+
+
+class Task(models.Model):
+    """Модель фоновой задачи в очереди."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(
+        max_length=TaskQueueLimits.MAX_LEN_NAME,
+        verbose_name='Задача',
+    )
+    args = models.JSONField(
+        default=list,
+        verbose_name='Аргументы',
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='Статус',
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Время запуска',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток',
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=TaskQueueLimits.MAX_ATTEMPTS,
+        verbose_name='Максимум попыток',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+
+    class Meta:
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=('run_at',),
+                condition=models.Q(status__in=('queued', 'running')),
+                name='task_pending_run_at',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{tuple(self.args)}'
@@ -1,5 +1,149 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageSizePagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() на асинхронном ORM: COUNT и строки
+        страницы читаются без перехода в поток синхронного кода.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [
+            item async for item in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return self.page.object_list
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу (key_field, id) без OFFSET и COUNT.
+    Курсор указывает на последний объект предыдущей страницы.
+    """
+    key_field = 'pub_date'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() на асинхронном ORM."""
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """Строки страницы и ещё одна — признак следующей страницы."""
+        self.request = request
+        self.limit = self.get_page_size(request)
+        queryset = self.order_queryset(queryset)
+        position = self.decode_cursor(request)
+        if position is not None:
+            key, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{self.key_field}__lt': key})
+                | Q(**{self.key_field: key, 'id__lt': pk})
+            )
+        return queryset[:self.limit + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.limit
+        self.page = results[:self.limit]
+        return self.page
+
+    def order_queryset(self, queryset):
+        return queryset.order_by(f'-{self.key_field}', '-id')
+
+    def parse_key(self, raw_key):
+        return parse_datetime(raw_key)
+
+    def format_key(self, key):
+        return key.isoformat()
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            raw_key, pk = base64.urlsafe_b64decode(
+                encoded.encode()).decode().rsplit('|', 1)
+            key = self.parse_key(raw_key)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if key is None:
+            raise NotFound(self.invalid_cursor_message)
+        return key, pk
+
+    def encode_cursor(self, item):
+        """Курсор по объекту модели или строке values()."""
+        if isinstance(item, dict):
+            key, pk = item[self.key_field], item['id']
+        else:
+            key, pk = getattr(item, self.key_field), item.id
+        raw = f'{self.format_key(key)}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+
+class PopularityPagination(KeysetPagination):
+    """Постраничный вывод рецептов по рейтингу популярности."""
+    key_field = 'popularity'
+
+    def order_queryset(self, queryset):
+        return super().order_queryset(
+            queryset.annotate(popularity=F('ranking__score')))
+
+    def parse_key(self, raw_key):
+        return float(raw_key)
+
+    def format_key(self, key):
+        return repr(key)
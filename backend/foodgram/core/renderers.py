@@ -0,0 +1,30 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Компактный вывод совпадает с JSONRenderer;
+    типы, которых нет в orjson, и даты приводятся кодировщиком DRF,
+    а с отступами и при ошибках кодирования работает JSONRenderer.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029')
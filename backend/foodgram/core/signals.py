@@ -0,0 +1,53 @@
+"""
+Отзыв закэшированных токенов при выходе и изменении пользователя;
+удаление медиафайлов, оставшихся без записей.
+"""
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import revoke
+from .models import CustomUser as User
+from .storage import get_file_fields
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(revoke, [instance.key]))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Смена пароля, деактивация и изменения профиля."""
+    if created:
+        return
+    keys = list(Token.objects.filter(user=instance).values_list(
+        'key', flat=True))
+    if keys:
+        transaction.on_commit(partial(revoke, keys))
+
+
+@receiver(pre_save)
+def file_replaced(sender, instance, update_fields=None, **kwargs):
+    """Прежний файл заменённого или очищенного поля."""
+    field_names = get_file_fields().get(sender)
+    if update_fields is not None and field_names:
+        field_names = [name for name in field_names if name in update_fields]
+    if not field_names or instance._state.adding:
+        return
+    old = sender._default_manager.filter(pk=instance.pk).values(
+        *field_names).first() or {}
+    for name in field_names:
+        if old.get(name) and old[name] != getattr(instance, name).name:
+            default_storage.delete(old[name])
+
+
+@receiver(post_delete)
+def files_released(sender, instance, **kwargs):
+    for name in get_file_fields().get(sender, ()):
+        default_storage.delete(getattr(instance, name).name)
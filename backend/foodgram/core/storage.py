@@ -0,0 +1,102 @@
+"""
+Хранилище медиафайлов с адресацией по содержимому.
+
+Файл сохраняется под именем <каталог upload_to>/<sha256><расширение>.
+Одинаковые загрузки получают одно имя и хранятся один раз, а файл
+по имени никогда не меняется, поэтому nginx отдаёт /media/ с вечным
+кэшированием. Один файл может использоваться несколькими записями,
+так что удаление (FieldFile.delete(), замена или удаление записи)
+только ставит в очередь задачу, которая удалит файл, если на него
+больше не ссылается ни одно файловое поле.
+
+Сохранение и задача удаления в PostgreSQL берут advisory-блокировку
+имени файла: сохранение — разделяемую до конца своей транзакции,
+задача — исключительную на время проверки ссылок и удаления. Поэтому
+задача не удалит файл, на который ссылается ещё не закоммиченная
+запись. Запись со ссылкой должна сохраняться в той же транзакции,
+что и файл.
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connection, models, transaction
+
+from core.tasks import enqueue, task
+
+
+def lock_name(name, shared=False):
+    """Транзакционная advisory-блокировка имени файла (PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return
+    key = int.from_bytes(
+        hashlib.sha256(name.encode()).digest()[:8], 'big', signed=True)
+    function = ('pg_advisory_xact_lock_shared' if shared
+                else 'pg_advisory_xact_lock')
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {function}(%s)', [key])
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище с именами по SHA-256 содержимого."""
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        lock_name(name, shared=True)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def delete(self, name):
+        """Удаление откладывается до проверки ссылок на файл."""
+        if name:
+            enqueue(delete_orphaned_file, name)
+
+    def delete_now(self, name):
+        super().delete(name)
+
+
+@lru_cache(maxsize=None)
+def get_file_fields():
+    """Файловые поля моделей в default_storage: {модель: [поля]}."""
+    fields = {}
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if (isinstance(field, models.FileField)
+                    and field.storage is default_storage):
+                fields.setdefault(model, []).append(field.name)
+    return fields
+
+
+def is_referenced(name):
+    return any(
+        model._default_manager.filter(**{field_name: name}).exists()
+        for model, field_names in get_file_fields().items()
+        for field_name in field_names
+    )
+
+
+@task
+def delete_orphaned_file(name):
+    """Удаление файла, на который не ссылается ни одна запись."""
+    with transaction.atomic():
+        lock_name(name)
+        if not is_referenced(name):
+            default_storage.delete_now(name)
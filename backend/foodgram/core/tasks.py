@@ -0,0 +1,174 @@
+"""
+Очередь фоновых задач в БД без внешнего брокера.
+
+Задача — строка core_task с именем функции и аргументами в JSON.
+Она добавляется в транзакции запроса и становится видна воркерам
+только после её фиксации. Воркеры (manage.py run_worker) берут задачи
+SELECT ... FOR UPDATE SKIP LOCKED: параллельные потоки не ждут друг
+друга и не получают одну задачу дважды. Взятая задача переводится
+в статус running, а run_at сдвигается на TIMEOUT: если воркер упал,
+задача снова станет доступна. Выполненная задача удаляется, после
+ошибки повторяется с экспоненциальной задержкой, а после max_attempts
+попыток остаётся в статусе failed.
+
+Периодические задачи (PERIODIC_TASKS) ставятся в очередь при запуске
+воркера, а после выполнения или окончательной ошибки — снова, через
+свой период. В очереди держится не больше одной строки такой задачи.
+"""
+import logging
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.constants import TaskQueueLimits
+from core.metrics import TASK_LAG, TASKS_PENDING, observe_task
+from core.models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(func=None, *, max_attempts=TaskQueueLimits.MAX_ATTEMPTS):
+    """Регистрация функции как фоновой задачи."""
+    if func is None:
+        return partial(task, max_attempts=max_attempts)
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    func.max_attempts = max_attempts
+    _registry[func.task_name] = func
+    return func
+
+
+def enqueue(func, *args, delay=0):
+    """
+    Постановка задачи в очередь через delay секунд. При TASKS_EAGER
+    задача выполняется в процессе после фиксации транзакции.
+    """
+    if settings.TASKS_EAGER:
+        transaction.on_commit(partial(func, *args))
+        return None
+    return Task.objects.create(
+        name=func.task_name, args=list(args),
+        max_attempts=func.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay))
+
+
+def schedule_periodic(*names, delay=0):
+    """Постановка периодических задач, которых ещё нет в очереди."""
+    names = names or tuple(settings.PERIODIC_TASKS)
+    pending = set(Task.objects.filter(
+        name__in=names,
+        status__in=(Task.Status.QUEUED, Task.Status.RUNNING),
+    ).values_list('name', flat=True))
+    for name in names:
+        if name not in pending:
+            enqueue(get_task(name), delay=delay)
+
+
+def reschedule(task):
+    """Следующий запуск периодической задачи через её период."""
+    if task.name in settings.PERIODIC_TASKS:
+        schedule_periodic(
+            task.name, delay=settings.PERIODIC_TASKS[task.name])
+
+
+def get_task(name):
+    """Функция задачи по имени; модуль импортируется при первом вызове."""
+    if name not in _registry:
+        import_string(name)
+    return _registry[name]
+
+
+def claim():
+    """
+    Следующая готовая к выполнению задача или None. Задача, воркер
+    которой упал на последней попытке, переводится в failed.
+    """
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            task = Task.objects.select_for_update(skip_locked=True).filter(
+                status__in=(Task.Status.QUEUED, Task.Status.RUNNING),
+                run_at__lte=now,
+            ).order_by('run_at').first()
+            if task is None:
+                return None
+            if task.attempts >= task.max_attempts:
+                task.status = Task.Status.FAILED
+                task.error = 'Превышено время выполнения.'
+                task.save(update_fields=['status', 'error'])
+                reschedule(task)
+                continue
+            TASK_LAG.labels(task.name).observe(
+                (now - task.run_at).total_seconds())
+            task.status = Task.Status.RUNNING
+            task.attempts += 1
+            task.run_at = now + timedelta(seconds=TaskQueueLimits.TIMEOUT)
+            task.save(update_fields=['status', 'attempts', 'run_at'])
+        return task
+
+
+def execute(task):
+    """Выполнение взятой задачи и запись результата."""
+    started = time.perf_counter()
+    try:
+        get_task(task.name)(*task.args)
+    except Exception as error:
+        logger.exception('Ошибка фоновой задачи %s.', task)
+        task.error = f'{type(error).__name__}: {error}'
+        if task.attempts < task.max_attempts:
+            result = 'retry'
+            task.status = Task.Status.QUEUED
+            task.run_at = timezone.now() + timedelta(
+                seconds=TaskQueueLimits.RETRY_DELAY
+                * 2 ** (task.attempts - 1))
+        else:
+            result = 'failed'
+            task.status = Task.Status.FAILED
+        task.save(update_fields=['status', 'run_at', 'error'])
+    else:
+        result = 'done'
+        Task.objects.filter(id=task.id).delete()
+    if result != 'retry':
+        reschedule(task)
+    observe_task(task.name, result, time.perf_counter() - started)
+    return result
+
+
+def work(stop, burst=False):
+    """
+    Цикл потока воркера до установки события stop. В режиме burst
+    поток завершается, когда готовых задач не осталось. Ошибки БД
+    (потеря соединения, таймаут) не останавливают поток: итерация
+    повторяется после паузы.
+    """
+    try:
+        while not stop.is_set():
+            try:
+                close_old_connections()
+                task = claim()
+                if task is not None:
+                    execute(task)
+                    continue
+            except Exception:
+                logger.exception('Ошибка цикла воркера.')
+            else:
+                if burst:
+                    break
+            stop.wait(TaskQueueLimits.POLL_INTERVAL)
+    finally:
+        connections.close_all()
+
+
+def update_queue_metrics():
+    """Число задач в очереди по статусам."""
+    counts = dict(Task.objects.order_by().values_list('status').annotate(
+        count=Count('id')))
+    for status in Task.Status.values:
+        TASKS_PENDING.labels(status).set(counts.get(status, 0))
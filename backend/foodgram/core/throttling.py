@@ -0,0 +1,87 @@
+"""
+Ограничение частоты запросов скользящим окном в общем кэше.
+
+Счётчики лежат в кэше default (Redis при заданном REDIS_URL) и общие
+для всех воркеров. На клиента приходится два счётчика: текущего и
+предыдущего окна длиной duration. Число запросов за последние duration
+секунд оценивается как текущий счётчик плюс часть предыдущего,
+пропорциональная ещё не вышедшему из интервала времени. Проверка —
+два обращения к кэшу независимо от частоты запросов, вместо списка
+отметок времени SimpleRateThrottle.
+"""
+from rest_framework.throttling import (AnonRateThrottle, SimpleRateThrottle,
+                                       UserRateThrottle)
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Скользящее окно из двух счётчиков фиксированных окон."""
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        window, offset = divmod(self.timer(), self.duration)
+        self.weight = 1 - offset / self.duration
+        current_key = f'{self.key}:{int(window)}'
+        self.previous = self.cache.get(f'{self.key}:{int(window) - 1}', 0)
+        self.current = self.increment(current_key)
+        if self.previous * self.weight + self.current <= self.num_requests:
+            return True
+        self.current = self.cache.decr(current_key)
+        return False
+
+    def increment(self, key):
+        """Атомарное увеличение счётчика окна; ключ живёт два окна."""
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def wait(self):
+        """Время до момента, когда следующий запрос уложится в лимит."""
+        remaining = self.duration * self.weight
+        free = self.num_requests - 1
+        if self.current <= free:
+            return max(
+                remaining - self.duration * (free - self.current)
+                / self.previous, 0)
+        return remaining + self.duration * (1 - free / self.current)
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottle, AnonRateThrottle):
+    pass
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottle, UserRateThrottle):
+    pass
+
+
+class ActionScopedThrottle(SlidingWindowThrottle):
+    """
+    Отдельные, более строгие лимиты действий вьюсета:
+    throttle_scopes = {'create': 'recipe_create', ...}.
+    """
+
+    def __init__(self):
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None))
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -28,17 +28,90 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
 
+# Бюджеты запросов к БД: «метод имя представления». Превышение пишется
+# в лог, а при QUERY_BUDGET_STRICT=True приводит к ошибке (для CI).
+# Бюджеты заданы для PostgreSQL и не зависят от числа строк на странице:
+# check_query_budgets проверяет их на полных страницах, рецептах без
+# документов и холодных кэшах. «Авторизация» — чтение токена с
+# пользователем, при тёплом кэше токена его нет. «Документы» — три
+# чтения для сборки недостающих документов страницы и постановка
+# их сохранения в очередь.
+QUERY_BUDGETS = {
+    # Авторизация, тег или автор фильтра, COUNT, страница, документы,
+    # отношения зрителя.
+    'GET api:recipes-list': 9,
+    # Авторизация, рецепт, документы, отношения зрителя.
+    'GET api:recipes-detail': 7,
+    # Авторизация, COUNT, авторы страницы, их рецепты одним запросом.
+    'GET api:users-subscriptions': 4,
+    # Авторизация, страница без COUNT (записи ленты и рецепты с отметкой
+    # pulled авторов из подписок), документы, отношения зрителя.
+    'GET api:users-feed': 7,
+    # Авторизация, рецепты списка покупок, документы.
+    'GET api:download_shopping_cart': 6,
+    # Авторизация, COUNT, страница с признаком подписки.
+    'GET api:customuser-list': 3,
+    'GET api:customuser-detail': 2,
+    'GET api:customuser-me': 1,
+    'GET api:tags-list': 2,
+    'GET api:ingredients-list': 2,
+    # Авторизация, проверка тегов и ингредиентов, блокировка имени
+    # изображения (core/storage.py), популярные авторы для отметки
+    # pulled, рецепт, ингредиенты, три запроса set() тегов, сборка и
+    # сохранение документа, раскладка и короткая ссылка в очередь, ответ
+    # (документ и отношения).
+    'POST api:recipes-list': 18,
+    # Авторизация, рецепт и его автор для прав доступа, проверка тегов и
+    # ингредиентов, старое изображение, рецепт, чтение тегов (без
+    # изменений), чтение, удаление и вставка ингредиентов, сборка и
+    # сохранение документа, ответ, блокировка имени нового изображения.
+    'PATCH api:recipes-detail': 18,
+    # Авторизация, рецепт, автор для прав, скрытие, отметка удаления для
+    # выгрузки, удаление в очередь.
+    'DELETE api:recipes-detail': 7,
+    # Авторизация и один запрос (цель и связь в CTE, recipes/toggles.py).
+    'POST api:recipes-favorite': 2,
+    'DELETE api:recipes-favorite': 2,
+    'POST api:recipes-shopping-cart': 2,
+    # Авторизация, связь, заполнение ленты, рецепты автора для ответа.
+    'POST api:users-subscribe': 4,
+    # Авторизация, связь, очистка ленты.
+    'DELETE api:users-subscribe': 3,
+    # Авторизация, три проверки уникальности имени и почты, пользователь.
+    'POST api:customuser-list': 5,
+}
+# Бюджеты для других БД там, где вместо одного SQL-запроса PostgreSQL
+# работает запасной путь через ORM (связи, set() тегов, bulk_create).
+QUERY_BUDGETS_FALLBACK = {
+    'POST api:recipes-list': 18,
+    'PATCH api:recipes-detail': 18,
+    'DELETE api:recipes-detail': 8,
+    'POST api:recipes-favorite': 5,
+    'DELETE api:recipes-favorite': 6,
+    'POST api:recipes-shopping-cart': 5,
+    'POST api:users-subscribe': 9,
+    'DELETE api:users-subscribe': 7,
+    'POST api:customuser-list': 6,
+}
+QUERY_BUDGET_STRICT = os.getenv(
+    'QUERY_BUDGET_STRICT', 'False').lower() == 'true'
+SERVER_TIMING_FOR_ALL = os.getenv(
+    'SERVER_TIMING_FOR_ALL', 'False').lower() == 'true'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -56,6 +129,22 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Асинхронные представления чтения (включаются при запуске под ASGI).
+ASYNC_READ_PATH = os.getenv('ASYNC_READ_PATH', 'False').lower() == 'true'
+
+# Прогрев процесса при запуске (включается конфигурацией gunicorn).
+WARM_UP = os.getenv('WARM_UP', 'False').lower() == 'true'
+
+# Фоновые задачи выполняются сразу после коммита, без воркера.
+TASKS_EAGER = os.getenv('TASKS_EAGER', 'False').lower() == 'true'
+
+# Периодические задачи воркера: {задача: период в секундах}.
+PERIODIC_TASKS = {
+    'recipes.ranking.refresh_ranking': int(
+        os.getenv('RANKING_REFRESH_INTERVAL', 300)),
+}
 
 
 DATABASES = {
@@ -65,10 +154,49 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Пул соединений на воркер (DB_POOL_SIZE=0 — постоянные соединения
+# без пула). Соединение возвращается в пул в конце каждого запроса.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+if DB_POOL_SIZE:
+    DATABASES['default'].update({
+        'ENGINE': 'core.db.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'max_size': DB_POOL_SIZE,
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            'check_after': float(os.getenv('DB_POOL_CHECK_AFTER', 30)),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+        },
+    })
+
+# Реплика для чтения (DB_REPLICA_HOST не задан — всё идёт в основную БД).
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    }
+
+# Общий для воркеров кэш: счётчики троттлинга, кэши приложения.
+# Без REDIS_URL — кэш в памяти процесса (только для разработки).
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
+DATABASE_ROUTERS = ['core.db.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
 # Для локальной отладки / создания миграций перед деплоем на сервер:
 # DATABASES = {
 #     'default': {
@@ -106,6 +234,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 AUTH_USER_MODEL = 'core.CustomUser'
 
 LOGIN_REDIRECT_URL = 'foodgram:index'
@@ -116,18 +253,22 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'core.throttling.AnonSlidingWindowThrottle',
+        'core.throttling.UserSlidingWindowThrottle',
+        'core.throttling.ActionScopedThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '1000/day',
-        'user': '7000/day'
+        'anon': os.getenv('THROTTLE_ANON_RATE', '1000/day'),
+        'user': os.getenv('THROTTLE_USER_RATE', '7000/day'),
+        'recipe_create': os.getenv('THROTTLE_RECIPE_CREATE_RATE', '30/hour'),
+        'upload': os.getenv('THROTTLE_UPLOAD_RATE', '60/hour'),
+        'export': os.getenv('THROTTLE_EXPORT_RATE', '10/hour'),
     },
     'PAGE_SIZE': 6,
     'DEFAULT_PAGINATION_CLASS': 'core.pagination.PageSizePagination',
@@ -0,0 +1,42 @@
+"""
+Конфигурация gunicorn.
+
+Приложение загружается в мастере (preload_app) и прогревается до форка
+(WARM_UP, см. api/warmup.py), воркеры получают его через copy-on-write.
+Воркеры uvicorn: чтение обслуживается асинхронно, ожидание БД и Redis
+не занимает процесс, поэтому воркеров достаточно по числу ядер плюс
+один; каждый держит свой пул из DB_POOL_SIZE соединений. Воркеры
+перезапускаются после max_requests запросов со случайным разбросом,
+чтобы не перезапускаться одновременно.
+"""
+import multiprocessing
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+os.environ.setdefault('WARM_UP', 'True')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:7000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS',
+                         'uvicorn_worker.UvicornWorker')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+
+def on_starting(server):
+    """Очистка метрик воркеров предыдущего запуска."""
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
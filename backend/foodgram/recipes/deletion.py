@@ -0,0 +1,161 @@
+"""
+Удаление пользователей и рецептов без каскада в одной транзакции.
+
+Каскад Django загружает в память все связанные строки (на моделях
+есть обработчики post_delete) и держит блокировки до конца транзакции.
+Поэтому удаление сначала скрывает объект: ставит отметку deleted,
+и объект пропадает из Recipe.objects и User.objects. Пользователь
+деактивируется, его токены удаляются, рецепты скрываются вместе с ним.
+Связанные строки удаляет фоновая задача пачками по BATCH_SIZE, каждая
+в своей транзакции, с паузой PAUSE между пачками. Задача работает
+не дольше TIME_BUDGET секунд, затем ставит своё продолжение в очередь.
+Сам объект удаляется последним, когда каскаду почти нечего удалять;
+рецепты пользователя — по RECIPE_BATCH_SIZE.
+"""
+import logging
+import time
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.constants import DeletionLimits
+from core.models import CustomUser as User
+from core.tasks import enqueue, task
+from .models import (DeletedRecipe, Favorites, Recipe, ShoppingCart,
+                     Subscribe, TimelineEntry)
+
+logger = logging.getLogger(__name__)
+
+# Связи, которых у объекта может быть много: (модель, поле).
+RECIPE_RELATIONS = (
+    (Favorites, 'recipe'),
+    (ShoppingCart, 'recipe'),
+    (TimelineEntry, 'recipe'),
+)
+USER_RELATIONS = (
+    (Subscribe, 'user'),
+    (Subscribe, 'author'),
+    (Favorites, 'user'),
+    (ShoppingCart, 'user'),
+    (TimelineEntry, 'user'),
+    (TimelineEntry, 'author'),
+)
+
+
+def mark_deleted(recipe_ids, deleted):
+    """Отметки удаления рецептов для инкрементальной выгрузки."""
+    DeletedRecipe.objects.bulk_create(
+        [DeletedRecipe(id=recipe_id, deleted=deleted)
+         for recipe_id in recipe_ids],
+        ignore_conflicts=True,
+    )
+
+
+def hide_recipes(recipes):
+    """Скрытие рецептов и постановка их удаления в очередь."""
+    recipe_ids = list(recipes.filter(
+        deleted__isnull=True).values_list('id', flat=True))
+    now = timezone.now()
+    Recipe.all_objects.filter(id__in=recipe_ids).update(deleted=now)
+    mark_deleted(recipe_ids, now)
+    for recipe_id in recipe_ids:
+        enqueue(purge_recipe, recipe_id)
+
+
+def hide_users(users):
+    """Скрытие и деактивация пользователей с их рецептами."""
+    user_ids = list(users.filter(
+        deleted__isnull=True).values_list('id', flat=True))
+    now = timezone.now()
+    User.all_objects.filter(id__in=user_ids).update(
+        deleted=now, is_active=False)
+    recipes = Recipe.all_objects.filter(
+        author_id__in=user_ids, deleted__isnull=True)
+    mark_deleted(recipes.values_list('id', flat=True), now)
+    recipes.update(deleted=now)
+    Token.objects.filter(user_id__in=user_ids).delete()
+    for user_id in user_ids:
+        enqueue(purge_user, user_id)
+
+
+def get_remaining(relations, object_id):
+    """Число оставшихся связанных строк: {(модель, поле): число}."""
+    return {
+        (model, field): model.objects.filter(**{field: object_id}).count()
+        for model, field in relations
+    }
+
+
+class Purge:
+    """Пакетное удаление связанных строк в пределах времени задачи."""
+
+    def __init__(self):
+        self.deadline = time.monotonic() + DeletionLimits.TIME_BUDGET
+        self.deleted = 0
+
+    def delete_batches(self, queryset):
+        """
+        Удаление строк queryset пачками; False, если время
+        задачи вышло раньше, чем строки закончились.
+        """
+        model = queryset.model
+        while time.monotonic() < self.deadline:
+            with transaction.atomic():
+                ids = list(queryset.values_list('pk', flat=True)[
+                    :DeletionLimits.BATCH_SIZE])
+                if not ids:
+                    return True
+                self.deleted += model._base_manager.filter(
+                    pk__in=ids).delete()[0]
+            time.sleep(DeletionLimits.PAUSE)
+        return False
+
+    def relations(self, relations, object_ids):
+        return all(
+            self.delete_batches(model.objects.filter(
+                **{f'{field}__in': object_ids}))
+            for model, field in relations
+        )
+
+    def recipes(self, recipe_ids):
+        """Рецепты удаляются после своих многочисленных связей."""
+        if not self.relations(RECIPE_RELATIONS, recipe_ids):
+            return False
+        self.deleted += Recipe.all_objects.filter(
+            id__in=recipe_ids).delete()[0]
+        return True
+
+    def user(self, user_id):
+        if not self.relations(USER_RELATIONS, [user_id]):
+            return False
+        recipes = Recipe.all_objects.filter(
+            author_id=user_id).values_list('id', flat=True)
+        while recipe_ids := list(
+                recipes[:DeletionLimits.RECIPE_BATCH_SIZE]):
+            if not self.recipes(recipe_ids):
+                return False
+        self.deleted += User.all_objects.filter(id=user_id).delete()[0]
+        return True
+
+
+@task
+def purge_recipe(recipe_id):
+    """Удаление скрытого рецепта со связанными строками."""
+    purge = Purge()
+    done = purge.recipes([recipe_id])
+    logger.info('Удаление рецепта %s: удалено строк %s%s.', recipe_id,
+                purge.deleted, '' if done else ', продолжение в очереди')
+    if not done:
+        enqueue(purge_recipe, recipe_id)
+
+
+@task
+def purge_user(user_id):
+    """Удаление скрытого пользователя, его рецептов и связей."""
+    purge = Purge()
+    done = purge.user(user_id)
+    logger.info('Удаление пользователя %s: удалено строк %s%s.', user_id,
+                purge.deleted, '' if done else ', продолжение в очереди')
+    if not done:
+        enqueue(purge_user, user_id)
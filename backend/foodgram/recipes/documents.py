@@ -0,0 +1,151 @@
+"""
+Денормализованный документ рецепта (Recipe.document).
+
+Документ хранит не зависящую от пользователя часть представления
+рецепта: теги, автора, ингредиенты и поля рецепта. Он пересобирается
+в транзакции изменения рецепта, его тегов и ингредиентов, тега,
+ингредиента или профиля автора. Ключи вложенных структур не хранятся:
+jsonb не сохраняет их порядок. Документ, который при чтении оказался
+не собран или устарел, сохраняет фоновая задача rebuild_stale.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.constants import DocumentLimits
+from core.tasks import enqueue, task
+from .models import Recipe, RecipeIngredients
+
+DOCUMENT_VERSION = 1
+AUTHOR_FIELDS = ('first_name', 'last_name', 'username', 'email', 'avatar')
+QUEUED_CACHE_KEY = 'documents:queued:{}'
+
+_pending = ContextVar('recipe_documents_pending', default=None)
+
+
+def build_documents(recipe_ids):
+    """Документы рецептов по идентификаторам (три запроса)."""
+    rows = Recipe.objects.filter(id__in=recipe_ids).values_list(
+        'id', 'name', 'image', 'text', 'cooking_time', 'author_id',
+        *(f'author__{field}' for field in AUTHOR_FIELDS))
+    documents = {
+        recipe_id: {
+            'version': DOCUMENT_VERSION,
+            'tags': [],
+            'author': [author_id, *author],
+            'ingredients': [],
+            'name': name,
+            'image': image,
+            'text': text,
+            'cooking_time': cooking_time,
+        }
+        for (recipe_id, name, image, text, cooking_time, author_id,
+             *author) in rows
+    }
+    for recipe_id, *tag in Recipe.tags.through.objects.filter(
+        recipe_id__in=documents
+    ).order_by('tag_id').values_list(
+            'recipe_id', 'tag__id', 'tag__name', 'tag__slug'):
+        documents[recipe_id]['tags'].append(tag)
+    for recipe_id, *ingredient in RecipeIngredients.objects.filter(
+        recipe_id__in=documents
+    ).order_by('id').values_list(
+            'recipe_id', 'ingredient__id', 'ingredient__name', 'amount',
+            'ingredient__measurement_unit'):
+        documents[recipe_id]['ingredients'].append(ingredient)
+    return documents
+
+
+def is_current(document):
+    return bool(document) and document.get('version') == DOCUMENT_VERSION
+
+
+def rebuild(recipe_ids, batch_size=DocumentLimits.REBUILD_BATCH_SIZE):
+    """
+    Пересборка и сохранение документов; возвращает их число.
+    Дата изменения рецептов обновляется: они попадут в выгрузку since.
+    """
+    iterator = iter(recipe_ids)
+    total = 0
+    while batch := list(islice(iterator, batch_size)):
+        documents = build_documents(batch)
+        now = timezone.now()
+        Recipe.objects.bulk_update(
+            [Recipe(id=recipe_id, document=document, updated=now)
+             for recipe_id, document in documents.items()],
+            ['document', 'updated']
+        )
+        total += len(documents)
+    return total
+
+
+@task
+def rebuild_stale(recipe_ids):
+    """Сохранение документов, которые всё ещё не собраны или устарели."""
+    return rebuild([
+        recipe_id for recipe_id, document in Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', 'document')
+        if not is_current(document)
+    ])
+
+
+def enqueue_stale(recipe_ids):
+    """
+    Постановка сохранения документов, собранных при чтении, в очередь.
+    Чтение могло идти с реплики, поэтому документ пересобирается
+    задачей; рецепт ставится в очередь не чаще REBUILD_QUEUED_TIMEOUT.
+    """
+    keys = {QUEUED_CACHE_KEY.format(recipe_id): recipe_id
+            for recipe_id in recipe_ids}
+    queued = cache.get_many(keys)
+    keys = {key: recipe_id for key, recipe_id in keys.items()
+            if key not in queued}
+    if keys:
+        cache.set_many(dict.fromkeys(keys, True),
+                       DocumentLimits.REBUILD_QUEUED_TIMEOUT)
+        enqueue(rebuild_stale, sorted(keys.values()))
+
+
+def invalidate(recipe_ids):
+    """
+    Пересборка документов в текущей транзакции; внутри deferred()
+    откладывается до выхода из блока.
+    """
+    pending = _pending.get()
+    if pending is not None:
+        pending.update(recipe_ids)
+    else:
+        rebuild(recipe_ids)
+
+
+@contextmanager
+def deferred():
+    """Одна пересборка на все изменения рецептов внутри блока."""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = set()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    rebuild(sorted(pending))
+
+
+def invalidate_author(author_id):
+    invalidate(Recipe.objects.filter(
+        author_id=author_id).values_list('id', flat=True))
+
+
+def invalidate_tag(tag_id):
+    invalidate(Recipe.objects.filter(
+        tags=tag_id).values_list('id', flat=True))
+
+
+def invalidate_ingredient(ingredient_id):
+    invalidate(RecipeIngredients.objects.filter(
+        ingredient_id=ingredient_id).values_list('recipe_id', flat=True))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.15 on 2026-10-19 10:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipeingredients',
+            options={'ordering': ('id',), 'verbose_name': 'количество ингредиента', 'verbose_name_plural': 'Количество ингредиентов'},
+        ),
+        migrations.AlterModelOptions(
+            name='tag',
+            options={'ordering': ('id',), 'verbose_name': 'тэг', 'verbose_name_plural': 'Тэги'},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-19 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_tag_recipeingredients_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='document',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Документ для чтения'),
+        ),
+    ]
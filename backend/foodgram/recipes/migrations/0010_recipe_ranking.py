@@ -0,0 +1,40 @@
+# Generated by Django 4.2.15 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorites',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(verbose_name='Популярность')),
+                ('refreshed', models.DateTimeField(verbose_name='Пересчитан')),
+            ],
+            options={
+                'verbose_name': 'рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинг рецептов',
+                'indexes': [models.Index(fields=['-score', '-recipe'], name='ranking_score_idx')],
+            },
+        ),
+    ]
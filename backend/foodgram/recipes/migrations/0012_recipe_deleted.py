@@ -0,0 +1,33 @@
+# Generated by Django 4.2.15 on 2026-10-19 11:29
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'default_manager_name': 'all_objects', 'ordering': ('-pub_date',), 'verbose_name': 'рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AlterModelManagers(
+            name='recipe',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='deleted',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата удаления'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['deleted'], name='recipe_deleted_idx'),
+        ),
+    ]
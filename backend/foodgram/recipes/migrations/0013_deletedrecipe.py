@@ -0,0 +1,38 @@
+# Generated by Django 4.2.15 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+def mark_hidden_recipes(apps, schema_editor):
+    """Отметки для рецептов, скрытых до появления модели."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    DeletedRecipe = apps.get_model('recipes', 'DeletedRecipe')
+    DeletedRecipe.objects.bulk_create(
+        [DeletedRecipe(id=recipe_id, deleted=deleted)
+         for recipe_id, deleted in Recipe._default_manager.filter(
+             deleted__isnull=False).values_list('id', 'deleted')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecipe',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Идентификатор рецепта')),
+                ('deleted', models.DateTimeField(db_index=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'удалённый рецепт',
+                'verbose_name_plural': 'Удалённые рецепты',
+                'ordering': ('deleted', 'id'),
+            },
+        ),
+        migrations.RunPython(mark_hidden_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.15 on 2026-10-19 13:09
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from core.constants import TimelineLimits
+
+
+def mark_pulled_recipes(apps, schema_editor):
+    """Отметка рецептов авторов, чьи рецепты лента уже читала сама."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscribe = apps.get_model('recipes', 'Subscribe')
+    Recipe._default_manager.filter(
+        author__in=Subscribe.objects.values('author')
+        .annotate(followers=Count('id'))
+        .filter(followers__gte=TimelineLimits.CELEBRITY_FOLLOWERS)
+        .values('author')
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_deletedrecipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Читается в ленту при запросе'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('pulled', True)), fields=['author', '-pub_date'], name='recipe_pulled_idx'),
+        ),
+        migrations.RunPython(mark_pulled_recipes, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,7 @@
 import hashlib
 
 from core.constants import RecipesLimits
-from core.models import CustomUser as User
+from core.models import CustomUser as User, NotDeletedManager
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
@@ -49,6 +49,7 @@ class Tag(models.Model):
     class Meta:
         verbose_name = 'тэг'
         verbose_name_plural = 'Тэги'
+        ordering = ('id',)
 
     def __str__(self):
         return self.name
@@ -60,6 +61,7 @@ class Recipe(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
+        db_index=False,
         verbose_name='Автор'
     )
     name = models.CharField(
@@ -91,16 +93,68 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True,
                                     db_index=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    document = models.JSONField(
+        'Документ для чтения', null=True, blank=True, editable=False
+    )
+    deleted = models.DateTimeField(
+        'Дата удаления', null=True, blank=True, editable=False
+    )
+    pulled = models.BooleanField(
+        'Читается в ленту при запросе', default=False, editable=False
+    )
+
+    objects = NotDeletedManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        default_manager_name = 'all_objects'
+        indexes = [
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('updated', 'id'),
+                name='recipe_updated_idx'
+            ),
+            models.Index(
+                fields=('deleted',),
+                condition=models.Q(deleted__isnull=False),
+                name='recipe_deleted_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                condition=models.Q(pulled=True),
+                name='recipe_pulled_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class DeletedRecipe(models.Model):
+    """
+    Модель отметки удалённого рецепта.
+    Сохраняется при скрытии рецепта и переживает удаление его строки:
+    по ней инкрементальная выгрузка (api/export.py) сообщает об удалении.
+    """
+    id = models.BigIntegerField('Идентификатор рецепта', primary_key=True)
+    deleted = models.DateTimeField('Дата удаления', db_index=True)
+
+    class Meta:
+        verbose_name = 'удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+        ordering = ('deleted', 'id')
+
+    def __str__(self):
+        return str(self.id)
+
+
 class RecipeIngredients(models.Model):
     """
     Модель для создания списка ингредиентов
@@ -131,6 +185,7 @@ class RecipeIngredients(models.Model):
     class Meta:
         verbose_name = 'количество ингредиента'
         verbose_name_plural = 'Количество ингредиентов'
+        ordering = ('id',)
         constraints = [
             models.UniqueConstraint(
                 fields=('recipe', 'ingredient'),
@@ -188,6 +243,11 @@ class Favorites(models.Model):
         related_name='favorite_by_users',
         verbose_name='Избранный рецепт'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Добавлен'
+    )
 
     class Meta:
         verbose_name = 'избранное'
@@ -214,6 +274,11 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         verbose_name='Рецепт в списке покупок',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Добавлен',
+    )
 
     class Meta:
         verbose_name = 'список покупок'
@@ -226,6 +291,33 @@ class ShoppingCart(models.Model):
         ]
 
 
+class RecipeRanking(models.Model):
+    """
+    Модель рейтинга популярности рецепта.
+    Пересчитывается периодической задачей по недавним
+    добавлениям в избранное и список покупок.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField(verbose_name='Популярность')
+    refreshed = models.DateTimeField(verbose_name='Пересчитан')
+
+    class Meta:
+        verbose_name = 'рейтинг рецепта'
+        verbose_name_plural = 'Рейтинг рецептов'
+        indexes = [
+            models.Index(
+                fields=('-score', '-recipe'),
+                name='ranking_score_idx'
+            )
+        ]
+
+
 class RecipeShortLink(models.Model):
     """Модель для хранения сокращённых ссылок на рецепты."""
     recipe = models.OneToOneField(
@@ -267,3 +359,45 @@ class RecipeShortLink(models.Model):
         if not self.short_link:
             self.short_link = self.generate_short_link()
         super().save(*args, **kwargs)
+
+
+class TimelineEntry(models.Model):
+    """
+    Модель записи ленты подписок.
+    Заполняется при публикации рецепта (fan-out on write),
+    кроме рецептов с отметкой pulled.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique recipe in timeline'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            )
+        ]
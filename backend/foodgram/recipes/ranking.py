@@ -0,0 +1,66 @@
+"""
+Рейтинг популярных рецептов.
+
+Популярность — сумма добавлений рецепта в избранное и список покупок
+за последние WINDOW_DAYS дней; вклад события убывает вдвое каждые
+HALF_LIFE_HOURS часов. Периодическая задача читает по индексу created
+только события окна, сгруппированные по часам, обновляет оценки
+рецептов с такими событиями и удаляет из таблицы остальные. Список
+рецептов с ordering=popular читает готовую таблицу по индексу оценки.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from core.constants import RankingLimits
+from core.tasks import task
+from .models import Favorites, RecipeRanking, ShoppingCart
+
+EVENT_WEIGHTS = (
+    (Favorites, RankingLimits.FAVORITE_WEIGHT),
+    (ShoppingCart, RankingLimits.CART_WEIGHT),
+)
+
+
+def compute_scores(now):
+    """Оценки рецептов с событиями в окне: {recipe_id: оценка}."""
+    since = now - timedelta(days=RankingLimits.WINDOW_DAYS)
+    scores = {}
+    for model, weight in EVENT_WEIGHTS:
+        events = model.objects.filter(created__gt=since).annotate(
+            hour=TruncHour('created')
+        ).order_by().values_list('recipe_id', 'hour').annotate(
+            events=Count('id'))
+        for recipe_id, hour, count in events:
+            age = (now - hour).total_seconds() / 3600
+            scores[recipe_id] = scores.get(recipe_id, 0) + (
+                weight * count * 0.5 ** (age / RankingLimits.HALF_LIFE_HOURS))
+    return scores
+
+
+def refresh(now=None):
+    """Пересчёт таблицы рейтинга; возвращает число рецептов в ней."""
+    now = now or timezone.now()
+    scores = compute_scores(now)
+    with transaction.atomic():
+        RecipeRanking.objects.bulk_create(
+            [
+                RecipeRanking(recipe_id=recipe_id, score=score, refreshed=now)
+                for recipe_id, score in scores.items()
+            ],
+            batch_size=RankingLimits.BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=['score', 'refreshed'],
+        )
+        RecipeRanking.objects.exclude(refreshed=now).delete()
+    return len(scores)
+
+
+@task
+def refresh_ranking():
+    """Периодический пересчёт рейтинга (см. PERIODIC_TASKS)."""
+    refresh()
@@ -0,0 +1,166 @@
+"""
+Кэш отношений пользователя: избранное, список покупок и подписки.
+
+Идентификаторы хранятся в общем кэше отсортированными массивами int64
+вместе с версией записи, проверка принадлежности — двоичный поиск.
+Версия пользователя увеличивается атомарно при каждом изменении, запись
+с другой версией считается устаревшей и перечитывается из БД одним
+запросом. Действия favorite, shopping_cart и subscribe обновляют запись
+после коммита (write-through), так что воркеры видят изменения сразу.
+"""
+from array import array
+from bisect import bisect_left
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value
+
+from core.constants import ViewerRelationsLimits
+from core.metrics import record_cache
+from .models import Favorites, ShoppingCart, Subscribe
+
+FAVORITES = 'favorites'
+CART = 'cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+KINDS = {
+    FAVORITES: (Favorites, 'recipe_id'),
+    CART: (ShoppingCart, 'recipe_id'),
+    SUBSCRIPTIONS: (Subscribe, 'author_id'),
+}
+
+
+class Relations:
+    """Отношения пользователя в отсортированных массивах."""
+
+    def __init__(self, version, ids):
+        self.version = version
+        self.ids = ids
+
+    @classmethod
+    def empty(cls):
+        return cls(None, {kind: array('q') for kind in KINDS})
+
+    @classmethod
+    def from_cache(cls, data):
+        version, raw = data
+        ids = {}
+        for kind, value in raw.items():
+            ids[kind] = array('q')
+            ids[kind].frombytes(value)
+        return cls(version, ids)
+
+    def to_cache(self):
+        return self.version, {
+            kind: ids.tobytes() for kind, ids in self.ids.items()}
+
+    def has(self, kind, item_id):
+        ids = self.ids[kind]
+        index = bisect_left(ids, item_id)
+        return index < len(ids) and ids[index] == item_id
+
+    def add(self, kind, item_id):
+        ids = self.ids[kind]
+        index = bisect_left(ids, item_id)
+        if index == len(ids) or ids[index] != item_id:
+            ids.insert(index, item_id)
+
+    def remove(self, kind, item_id):
+        ids = self.ids[kind]
+        index = bisect_left(ids, item_id)
+        if index < len(ids) and ids[index] == item_id:
+            del ids[index]
+
+
+def _keys(user_id):
+    return f'relations:{user_id}', f'relations:{user_id}:version'
+
+
+def load(user_id, version=None):
+    """Отношения пользователя из БД одним запросом."""
+    querysets = [
+        model.objects.filter(user_id=user_id).annotate(
+            kind=Value(kind)).values_list('kind', field)
+        for kind, (model, field) in KINDS.items()
+    ]
+    relations = Relations.empty()
+    relations.version = version
+    for kind, item_id in querysets[0].union(*querysets[1:], all=True):
+        relations.ids[kind].append(item_id)
+    for ids in relations.ids.values():
+        ids[:] = array('q', sorted(ids))
+    return relations
+
+
+def get_relations(user):
+    """Отношения пользователя из общего кэша или БД."""
+    if not user.is_authenticated:
+        return Relations.empty()
+    data_key, version_key = _keys(user.id)
+    cached = cache.get_many([data_key, version_key])
+    version = cached.get(version_key)
+    data = cached.get(data_key)
+    hit = data is not None and version is not None and data[0] == version
+    record_cache('viewer_relations', hit)
+    if hit:
+        return Relations.from_cache(data)
+    if version is None:
+        cache.add(version_key, 0, None)
+        version = cache.get(version_key, 0)
+    relations = load(user.id, version)
+    cache.set(data_key, relations.to_cache(),
+              ViewerRelationsLimits.CACHE_TIMEOUT)
+    return relations
+
+
+def for_request(request):
+    """Отношения текущего пользователя, один раз на запрос."""
+    relations = getattr(request, '_viewer_relations', None)
+    if relations is None:
+        relations = get_relations(request.user)
+        request._viewer_relations = relations
+    return relations
+
+
+def _next_version(version_key):
+    try:
+        return cache.incr(version_key)
+    except ValueError:
+        if cache.add(version_key, 1, None):
+            return 1
+        return cache.incr(version_key)
+
+
+def _update(user_id, kind, item_ids, added):
+    """
+    Изменение закэшированной записи. Если запись отстала от версии
+    (её никто не загружал или параллельно шло другое изменение),
+    она не обновляется и будет перечитана из БД.
+    """
+    data_key, version_key = _keys(user_id)
+    version = _next_version(version_key)
+    data = cache.get(data_key)
+    if data is None or data[0] != version - 1:
+        return
+    relations = Relations.from_cache(data)
+    for item_id in item_ids:
+        if added:
+            relations.add(kind, item_id)
+        else:
+            relations.remove(kind, item_id)
+    relations.version = version
+    cache.set(data_key, relations.to_cache(),
+              ViewerRelationsLimits.CACHE_TIMEOUT)
+
+
+def add(user_id, kind, *item_ids):
+    if item_ids:
+        transaction.on_commit(
+            partial(_update, user_id, kind, item_ids, True))
+
+
+def remove(user_id, kind, *item_ids):
+    if item_ids:
+        transaction.on_commit(
+            partial(_update, user_id, kind, item_ids, False))
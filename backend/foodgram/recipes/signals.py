@@ -0,0 +1,57 @@
+"""Пересборка документов рецептов при изменении связанных данных."""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import CustomUser as User
+from . import documents
+from .models import Ingredient, Recipe, RecipeIngredients, Tag
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    documents.invalidate([instance.id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list('id', flat=True))
+    elif not action.startswith('post_'):
+        return
+    elif not reverse:
+        documents.invalidate([instance.id])
+    elif action == 'post_clear':
+        documents.invalidate(instance.__dict__.pop('_cleared_recipe_ids'))
+    else:
+        documents.invalidate(pk_set)
+
+
+@receiver(post_delete, sender=Recipe.tags.through)
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_relation_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Recipe) or getattr(origin, 'model', None) is Recipe:
+        return
+    documents.invalidate([instance.recipe_id])
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        documents.invalidate_tag(instance.id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        documents.invalidate_ingredient(instance.id)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not set(
+            update_fields) & set(documents.AUTHOR_FIELDS)):
+        return
+    documents.invalidate_author(instance.id)
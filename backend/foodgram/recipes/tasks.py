@@ -0,0 +1,9 @@
+"""Фоновые задачи рецептов."""
+from core.tasks import task
+from .models import RecipeShortLink
+
+
+@task
+def create_short_link(recipe_id):
+    """Короткая ссылка нового рецепта создаётся заранее, не в запросе."""
+    RecipeShortLink.objects.get_or_create(recipe_id=recipe_id)
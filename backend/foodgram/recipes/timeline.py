@@ -0,0 +1,134 @@
+"""
+Лента рецептов авторов из подписок.
+
+Рецепт при публикации раскладывается по лентам подписчиков пачками
+фоновой задачей. Рецепты авторов с большим числом подписчиков
+получают отметку pulled и подтягиваются в ленту при чтении. Способ
+выбирается один раз при публикации: рецепт не пропадает из лент,
+когда число подписчиков автора меняется.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from core.constants import TimelineLimits
+from core.metrics import record_cache
+from core.tasks import enqueue, task
+from .models import Recipe, Subscribe, TimelineEntry
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+
+
+def get_celebrity_ids():
+    """Множество авторов, чьи новые рецепты не раскладываются по лентам."""
+    celebrities = cache.get(CELEBRITIES_CACHE_KEY)
+    record_cache('timeline_celebrities', celebrities is not None)
+    if celebrities is None:
+        celebrities = set(
+            Subscribe.objects.values('author')
+            .annotate(followers=Count('id'))
+            .filter(followers__gte=TimelineLimits.CELEBRITY_FOLLOWERS)
+            .values_list('author', flat=True)
+        )
+        cache.set(CELEBRITIES_CACHE_KEY, celebrities,
+                  TimelineLimits.CELEBRITIES_CACHE_TIMEOUT)
+    return celebrities
+
+
+def is_celebrity(author_id):
+    return author_id in get_celebrity_ids()
+
+
+@task
+def fan_out(recipe_id):
+    """Раскладка рецепта по лентам подписчиков автора пачками."""
+    recipe = Recipe.objects.filter(id=recipe_id).values(
+        'id', 'author_id', 'pulled').first()
+    if recipe is None or recipe['pulled']:
+        return
+    followers = Subscribe.objects.filter(
+        author_id=recipe['author_id']
+    ).order_by('user_id').values_list('user_id', flat=True)
+    last_id = 0
+    while True:
+        batch = list(followers.filter(
+            user_id__gt=last_id)[:TimelineLimits.FANOUT_BATCH_SIZE])
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id,
+                    recipe_id=recipe['id'],
+                    author_id=recipe['author_id']
+                )
+                for user_id in batch
+            ], ignore_conflicts=True
+        )
+        last_id = batch[-1]
+
+
+def publish(recipe):
+    """Постановка раскладки рецепта в очередь в транзакции публикации."""
+    if not recipe.pulled:
+        enqueue(fan_out, recipe.id)
+
+
+def backfill(user, *author_ids):
+    """
+    Добавление в ленту последних разложенных рецептов новых авторов
+    из подписок; рецепты с отметкой pulled лента читает сама.
+    На PostgreSQL — одним запросом INSERT ... SELECT.
+    """
+    recipes = Recipe.objects.filter(
+        author_id__in=author_ids, pulled=False
+    ).annotate(
+        rank=Window(RowNumber(), partition_by='author_id',
+                    order_by=F('pub_date').desc())
+    ).filter(
+        rank__lte=TimelineLimits.BACKFILL_RECIPES
+    ).values_list('id', 'author_id')
+    if connection.vendor == 'postgresql':
+        quote = connection.ops.quote_name
+        opts = TimelineEntry._meta
+        columns = ', '.join(
+            quote(opts.get_field(name).column)
+            for name in ('user', 'recipe', 'author'))
+        recipes_sql, params = recipes.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(opts.db_table)} ({columns}) '
+                f'SELECT %s, recipes.* FROM ({recipes_sql}) recipes '
+                f'ON CONFLICT DO NOTHING', (user.id, *params))
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user=user, recipe_id=recipe_id, author_id=author_id)
+            for recipe_id, author_id in recipes
+        ], ignore_conflicts=True
+    )
+
+
+def prune(user, *author_ids):
+    """
+    Удаление из ленты рецептов авторов после отписки одним запросом
+    DELETE: у записей ленты нет файлов и зависимых строк, поэтому
+    сборщик каскада и post_delete не нужны.
+    """
+    entries = TimelineEntry.objects.filter(
+        user=user, author_id__in=author_ids)
+    entries._raw_delete(entries.db)
+
+
+def get_feed_queryset(user):
+    """
+    Рецепты ленты: разложенные записи и рецепты с отметкой pulled
+    авторов из подписок.
+    """
+    return Recipe.objects.filter(
+        Q(id__in=TimelineEntry.objects.filter(
+            user=user).values('recipe'))
+        | Q(pulled=True, author_id__in=Subscribe.objects.filter(
+            user=user).values('author'))
+    )
@@ -0,0 +1,119 @@
+"""
+Добавление и удаление связей пользователя (избранное, список покупок,
+подписки) одним запросом, в том числе для списка целей.
+
+На PostgreSQL цель связи выбирается в CTE, вставка выполняется
+INSERT ... ON CONFLICT DO NOTHING, удаление — DELETE ... RETURNING,
+а по результату одного запроса видно, существует ли цель и изменилась
+ли связь для каждой цели. На других БД используется ORM.
+"""
+from django.db import connection
+from django.utils import timezone
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return columns, cursor.fetchall()
+
+
+def _fields(model, user_field, target_field):
+    opts = model._meta
+    quote = connection.ops.quote_name
+    return (quote(opts.db_table), quote(opts.get_field(user_field).column),
+            quote(opts.get_field(target_field).column))
+
+
+def _created_columns(model):
+    """Столбцы полей auto_now_add: в сыром INSERT их заполняет запрос."""
+    return [
+        connection.ops.quote_name(field.column)
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+
+
+def _existing(model, user_id, target_field, ids):
+    return set(model.objects.filter(**{
+        'user_id': user_id, f'{target_field}_id__in': ids
+    }).values_list(f'{target_field}_id', flat=True))
+
+
+def add_many(model, user_id, target_field, target):
+    """
+    Связи пользователя с целями из запроса target (values() с полем id).
+    Возвращает найденные строки целей с признаком создания связи.
+    """
+    target = target.order_by()
+    if connection.vendor != 'postgresql':
+        rows = list(target)
+        existing = _existing(model, user_id, target_field,
+                             [row['id'] for row in rows])
+        model.objects.bulk_create([
+            model(**{'user_id': user_id, f'{target_field}_id': row['id']})
+            for row in rows if row['id'] not in existing
+        ], ignore_conflicts=True)
+        return [(row, row['id'] not in existing) for row in rows]
+    table, user_column, target_column = _fields(
+        model, 'user', target_field)
+    created_columns = _created_columns(model)
+    insert_columns = ', '.join(
+        [user_column, target_column, *created_columns])
+    created_values = ', %s' * len(created_columns)
+    target_sql, params = target.query.sql_with_params()
+    columns, rows = _execute(
+        f'WITH target AS ({target_sql}), '
+        f'inserted AS (INSERT INTO {table} ({insert_columns}) '
+        f'SELECT %s, id{created_values} FROM target ON CONFLICT DO NOTHING '
+        f'RETURNING {target_column}) '
+        f'SELECT target.*, target.id IN (SELECT {target_column} '
+        f'FROM inserted) FROM target',
+        (*params, user_id, *[timezone.now()] * len(created_columns)))
+    return [(dict(zip(columns[:-1], row[:-1])), row[-1]) for row in rows]
+
+
+def add(model, user_id, target_field, target):
+    """
+    Связь пользователя с одной целью. Возвращает строку цели
+    (None, если её нет) и признак создания.
+    """
+    results = add_many(model, user_id, target_field, target)
+    return results[0] if results else (None, False)
+
+
+def remove_many(model, user_id, target_field, target):
+    """
+    Удаление связей пользователя с целями из запроса target.
+    Возвращает идентификаторы найденных целей с признаком удаления.
+    """
+    target = target.order_by().values('id')
+    if connection.vendor != 'postgresql':
+        ids = [row['id'] for row in target]
+        existing = _existing(model, user_id, target_field, ids)
+        if existing:
+            model.objects.filter(**{
+                'user_id': user_id, f'{target_field}_id__in': existing
+            }).delete()
+        return [(target_id, target_id in existing) for target_id in ids]
+    table, user_column, target_column = _fields(
+        model, 'user', target_field)
+    target_sql, params = target.query.sql_with_params()
+    _, rows = _execute(
+        f'WITH target AS ({target_sql}), '
+        f'deleted AS (DELETE FROM {table} WHERE {user_column} = %s '
+        f'AND {target_column} IN (SELECT id FROM target) '
+        f'RETURNING {target_column}) '
+        f'SELECT target.id, target.id IN (SELECT {target_column} '
+        f'FROM deleted) FROM target',
+        (*params, user_id))
+    return rows
+
+
+def remove(model, user_id, target_field, target):
+    """
+    Удаление связи пользователя с одной целью. Возвращает признаки
+    существования цели и удаления связи.
+    """
+    results = remove_many(model, user_id, target_field, target)
+    return (True, results[0][1]) if results else (False, False)